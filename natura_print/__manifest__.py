@@ -1,13 +1,15 @@
 {
     'name': 'Natura Label Printing',
-    'version': '1.0',
+    'version': '1.1',
     'category': 'Inventory/Label Printing',
     'summary': 'Manage Label Templates and printers and print labels',
     'description': "",
     'depends': ['base', 'product', 'stock', 'mrp'],
     'data': [
         'security/ir.model.access.csv', 
+        'data/ir_cron_data.xml',
         'views/printers_list_views.xml', 
+        'views/printer_pool_views.xml',
         'views/label_template_views.xml',
         'views/label_template_placeholder_views.xml',
         'views/label_automation_views.xml',
@@ -25,6 +27,7 @@
         'views/stock_quant_views.xml',
         'views/test_print_wizard_views.xml',
         'views/mrp_production_views.xml',
+        'views/print_job_views.xml',
         'views/natura_print_menus.xml'
         ],
     'assets': {
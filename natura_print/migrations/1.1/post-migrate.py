@@ -0,0 +1,19 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """Previews moved from an inline column to attachments: drop the column and
+    let the preview cron render them again (mostly from the preview cache)."""
+    cr.execute(
+        """
+        SELECT 1 FROM information_schema.columns
+         WHERE table_name = 'zpl_label_template' AND column_name = 'preview_image'
+        """
+    )
+    if not cr.fetchone():
+        return
+    cr.execute("ALTER TABLE zpl_label_template DROP COLUMN preview_image")
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    templates = env["zpl.label.template"].with_context(active_test=False).search([])
+    templates.write({"preview_state": "pending"})
+    templates._trigger_preview_rendering()
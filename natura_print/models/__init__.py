@@ -1,8 +1,12 @@
 from . import printers_list
+from . import printer_pool
 from . import label_template_placeholder
 from . import placeholder_path
 from . import label_automation_rule
 from . import natura_print_service
+from . import stored_format
+from . import print_job
+from . import idempotency_key
 from . import product_template
 from . import res_config_settings
 from . import res_users
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+
+class NaturaPrintIdempotencyKey(models.Model):
+    _name = "natura.print.idempotency.key"
+    _description = "Natura Print Sent Payload Key"
+    _order = "id desc"
+
+    key = fields.Char(string="Key", required=True, readonly=True)
+    printer_ip = fields.Char(string="Printer IP", readonly=True)
+    sent_date = fields.Datetime(string="Sent On", required=True, readonly=True)
+
+    _sql_constraints = [
+        ("natura_print_idempotency_key_unique", "unique(key)", "A payload key is recorded once."),
+    ]
+
+    @api.model
+    def _claim(self, keys_by_printer, window):
+        """Record ``{key: printer_ip}`` as being sent now and return the keys claimed.
+
+        Keys already recorded less than ``window`` seconds ago are not
+        claimed. The insert waits for concurrent transactions claiming the
+        same keys, so two submissions of the same payloads cannot both win.
+        """
+        if not keys_by_printer:
+            return set()
+        now = fields.Datetime.now()
+        rows = [(key, ip, now, self.env.uid, now, self.env.uid, now) for key, ip in keys_by_printer.items()]
+        self.env.cr.execute(
+            f"""
+            INSERT INTO {self._table}
+                (key, printer_ip, sent_date, create_uid, create_date, write_uid, write_date)
+            VALUES {", ".join(["%s"] * len(rows))}
+            ON CONFLICT (key) DO UPDATE
+                SET sent_date = EXCLUDED.sent_date, write_date = EXCLUDED.write_date
+                WHERE {self._table}.sent_date < %s
+            RETURNING key
+            """,
+            [*rows, now - timedelta(seconds=window)],
+        )
+        return {key for (key,) in self.env.cr.fetchall()}
+
+    @api.model
+    def _find_recent(self, keys, window):
+        """Return the ``keys`` recorded less than ``window`` seconds ago."""
+        if not keys:
+            return set()
+        recent = self.search(
+            [
+                ("key", "in", list(keys)),
+                ("sent_date", ">=", fields.Datetime.now() - timedelta(seconds=window)),
+            ]
+        )
+        return set(recent.mapped("key"))
+
+    @api.model
+    def _release(self, keys):
+        """Forget ``keys`` whose payloads were claimed but could not be sent."""
+        if keys:
+            self.search([("key", "in", list(keys))]).unlink()
+
+    @api.autovacuum
+    def _gc_expired_keys(self):
+        window = self.env["natura.print.service"]._get_config()["idempotency_window"]
+        self.search([("sent_date", "<", fields.Datetime.now() - timedelta(seconds=window))]).unlink()
@@ -1,4 +1,4 @@
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
 
 
 class NaturaPrintPlaceholder(models.Model):
@@ -44,6 +44,12 @@ class NaturaPrintPlaceholder(models.Model):
         "placeholder_id",
         string="Field Path Lines",
     )
+    field_path_error = fields.Char(
+        string="Field Path Error",
+        compute="_compute_field_path_error",
+        store=True,
+        readonly=True,
+    )
 
     @staticmethod
     def _normalize_placeholder(value):
@@ -63,12 +69,21 @@ class NaturaPrintPlaceholder(models.Model):
                 template = self.env["zpl.label.template"].browse(vals["template_id"])
                 if template.model_id:
                     vals["model_id"] = template.model_id.id
-        return super().create(vals_list)
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
 
     def write(self, vals):
         if "placeholder" in vals:
             vals["placeholder"] = self._normalize_placeholder(vals["placeholder"])
-        return super().write(vals)
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
 
     @api.depends("field_id")
     def _compute_related_model(self):
@@ -111,3 +126,39 @@ class NaturaPrintPlaceholder(models.Model):
                 record.field_path = record._build_field_path(
                     record.field_id, record.related_field_id
                 )
+
+    @api.depends("field_path", "field_id", "model_id")
+    def _compute_field_path_error(self):
+        for record in self:
+            field_path = (record.field_path or "").strip() or record.field_id.name
+            if not field_path or not record.model_id:
+                record.field_path_error = False
+                continue
+            record.field_path_error = (
+                self._compile_field_path(record.model_id.model, field_path)[1] or False
+            )
+
+    @api.model
+    @tools.ormcache("model_name", "field_path")
+    def _compile_field_path(self, model_name, field_path):
+        """Compile ``field_path`` into an accessor chain starting at ``model_name``.
+
+        Returns ``(hops, error)``: ``hops`` is a tuple of
+        ``(field_name, relational)`` pairs checked against each model's
+        ``_fields``, and ``error`` describes the first broken hop, if any.
+        """
+        if model_name not in self.env:
+            return (), f"Unknown model '{model_name}'."
+        model = self.env[model_name]
+        hops = []
+        parts = field_path.split(".")
+        for index, part in enumerate(parts):
+            field = model._fields.get(part)
+            if field is None:
+                return (), f"'{part}' is not a field of '{model._name}' in path '{field_path}'."
+            if not field.relational and index < len(parts) - 1:
+                return (), f"'{part}' on '{model._name}' is not relational in path '{field_path}'."
+            hops.append((part, field.relational))
+            if field.relational:
+                model = self.env[field.comodel_name]
+        return tuple(hops), False
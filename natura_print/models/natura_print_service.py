@@ -1,18 +1,678 @@
+import hashlib
+import logging
+import math
+import queue
+import random
+import re
+import select
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from datetime import timedelta
+
+import psycopg2
 import requests
+from requests.adapters import HTTPAdapter
 
-from odoo import _, models
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError
+from odoo.tools import frozendict
+
+from ..tools import labelary_client, zpl_rasterizer
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 10.0
+DEFAULT_CHUNK_MAX_BYTES = 256 * 1024
+DEFAULT_CHUNK_MAX_LABELS = 100
+DEFAULT_MAX_PARALLEL_PRINTERS = 8
+DEFAULT_RAW_PORT = 9100
+DEFAULT_RAW_CONNECT_TIMEOUT = 3.0
+DEFAULT_RAW_WRITE_TIMEOUT = 10.0
+# Zebra printers accept one raw connection at a time; do not hold it for long.
+RAW_SOCKET_IDLE_SECONDS = 10.0
+DEFAULT_SEND_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 0.5
+DEFAULT_BREAKER_THRESHOLD = 3
+DEFAULT_BREAKER_COOLDOWN = 60.0
+DEFAULT_ADAPTIVE_TARGET_BYTES = 64 * 1024
+DEFAULT_ADAPTIVE_TARGET_LATENCY = 1.0
+ADAPTIVE_MIN_BYTES = 8 * 1024
+LATENCY_SMOOTHING = 0.3
+DEFAULT_JOB_MAX_ATTEMPTS = 5
+# Print jobs created per INSERT when queueing a long run.
+JOB_CREATE_BATCH = 50
+DEFAULT_STATUS_TIMEOUT = 3.0
+DEFAULT_STATUS_MAX_AGE = 300
+DEFAULT_STATUS_POLL_WORKERS = 32
+DEFAULT_IDEMPOTENCY_WINDOW = 600
+PREVIEW_BACKENDS = [
+    ("local", "Built-in Renderer"),
+    ("labelary", "Labelary (online)"),
+]
+# Rendered previews kept in memory per worker, most recently used last.
+PREVIEW_MEMORY_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_PREVIEW_CACHE_DAYS = 30
+PREVIEW_WORKERS = 4
+DEFAULT_PREVIEW_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Printer states (see _parse_host_status) in which sends fail fast.
+PRINTER_DOWN_STATES = ("offline", "head_open", "paper_out", "ribbon_out", "error")
+
+# ir.config_parameter keys read by _get_config(), with their type and default.
+CONFIG_PARAMS = {
+    "hostname": (str, ""),
+    "api_user": (str, ""),
+    "api_password": (str, ""),
+    "pool_size": (int, DEFAULT_POOL_SIZE),
+    "connect_timeout": (float, DEFAULT_CONNECT_TIMEOUT),
+    "read_timeout": (float, DEFAULT_READ_TIMEOUT),
+    "chunk_max_bytes": (int, DEFAULT_CHUNK_MAX_BYTES),
+    "chunk_max_labels": (int, DEFAULT_CHUNK_MAX_LABELS),
+    "adaptive_target_bytes": (int, DEFAULT_ADAPTIVE_TARGET_BYTES),
+    "adaptive_target_latency": (float, DEFAULT_ADAPTIVE_TARGET_LATENCY),
+    "max_parallel_printers": (int, DEFAULT_MAX_PARALLEL_PRINTERS),
+    "raw_connect_timeout": (float, DEFAULT_RAW_CONNECT_TIMEOUT),
+    "raw_write_timeout": (float, DEFAULT_RAW_WRITE_TIMEOUT),
+    "send_retries": (int, DEFAULT_SEND_RETRIES),
+    "retry_backoff": (float, DEFAULT_RETRY_BACKOFF),
+    "breaker_threshold": (int, DEFAULT_BREAKER_THRESHOLD),
+    "breaker_cooldown": (float, DEFAULT_BREAKER_COOLDOWN),
+    "direct_print": (bool, False),
+    "job_max_attempts": (int, DEFAULT_JOB_MAX_ATTEMPTS),
+    "status_timeout": (float, DEFAULT_STATUS_TIMEOUT),
+    "status_max_age": (int, DEFAULT_STATUS_MAX_AGE),
+    "status_poll_workers": (int, DEFAULT_STATUS_POLL_WORKERS),
+    "idempotency_window": (int, DEFAULT_IDEMPOTENCY_WINDOW),
+    "preview_backend": (str, "local"),
+    "labelary_url": (str, labelary_client.DEFAULT_BASE_URL),
+    "labelary_rate": (float, labelary_client.DEFAULT_RATE),
+    "preview_cache_days": (int, DEFAULT_PREVIEW_CACHE_DAYS),
+    "preview_cache_max_bytes": (int, DEFAULT_PREVIEW_CACHE_MAX_BYTES),
+}
+
+SEND_ERRORS = (requests.RequestException, OSError)
+
+PRINT_QUANTITY_RE = re.compile(r"\^PQ(\d+)", re.IGNORECASE)
+FORMAT_END_RE = re.compile(r"\^XZ", re.IGNORECASE)
+# ~HS answers with three STX ... ETX framed strings.
+HOST_STATUS_QUERY = "~HS"
+HOST_STATUS_RE = re.compile(r"\x02([^\x03]*)\x03")
+
+_session_lock = threading.Lock()
+_sessions = {}
+_socket_lock = threading.Lock()
+_idle_sockets = {}
+_socket_reaper = None
+_breaker_lock = threading.Lock()
+_breakers = {}
+_latencies = {}
+_preview_lock = threading.Lock()
+_previews = OrderedDict()
+_preview_bytes = 0
+
+
+class CircuitOpenError(OSError):
+    """Raised instead of contacting a target whose circuit breaker is open."""
+
+
+class PrinterUnavailableError(OSError):
+    """Raised instead of sending to a printer the status poller reports as down."""
+
+
+def _get_http_session(pool_size):
+    """Return this worker's keep-alive relay session for ``pool_size`` connections."""
+    with _session_lock:
+        session = _sessions.get(pool_size)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[pool_size] = session
+        return session
+
+
+def _socket_is_alive(sock):
+    try:
+        readable, _writable, _errored = select.select([sock], [], [], 0)
+        # A readable idle socket means the printer closed it (or sent junk).
+        return not readable or sock.recv(1, socket.MSG_PEEK) != b""
+    except OSError:
+        return False
+
+
+def _checkout_socket(host, port, connect_timeout):
+    """Return ``(sock, reused)``: a pooled live socket to ``host:port`` or a new one."""
+    now = time.monotonic()
+    with _socket_lock:
+        idle = _idle_sockets.get((host, port), [])
+        while idle:
+            sock, released_at = idle.pop()
+            if now - released_at <= RAW_SOCKET_IDLE_SECONDS and _socket_is_alive(sock):
+                return sock, True
+            sock.close()
+    return socket.create_connection((host, port), timeout=connect_timeout), False
+
+
+def _checkin_socket(host, port, sock):
+    global _socket_reaper
+    with _socket_lock:
+        _idle_sockets.setdefault((host, port), []).append((sock, time.monotonic()))
+        if _socket_reaper is None or not _socket_reaper.is_alive():
+            _socket_reaper = threading.Thread(
+                target=_reap_idle_sockets, name="natura_print_socket_reaper", daemon=True
+            )
+            _socket_reaper.start()
+
+
+def _reap_idle_sockets():
+    """Close pooled raw sockets once idle for ``RAW_SOCKET_IDLE_SECONDS``.
+
+    Runs in a background thread while sockets are pooled: the printer
+    accepts a single raw connection, so an idle one must not outlive its
+    expiry waiting for this worker's next print.
+    """
+    global _socket_reaper
+    while True:
+        now = time.monotonic()
+        expired = []
+        with _socket_lock:
+            for key, idle in list(_idle_sockets.items()):
+                expired += [sock for sock, at in idle if now - at >= RAW_SOCKET_IDLE_SECONDS]
+                idle[:] = [(sock, at) for sock, at in idle if now - at < RAW_SOCKET_IDLE_SECONDS]
+                if not idle:
+                    del _idle_sockets[key]
+            oldest = min((at for idle in _idle_sockets.values() for _sock, at in idle), default=None)
+            if oldest is None:
+                _socket_reaper = None
+        for sock in expired:
+            sock.close()
+        if oldest is None:
+            return
+        time.sleep(min(max(oldest + RAW_SOCKET_IDLE_SECONDS - now, 0.05), 1.0))
+
+
+def _raw_send(host, port, data, connect_timeout, write_timeout):
+    """Stream ``data`` to the printer's raw port, reusing a pooled socket when possible.
+
+    A reused socket that fails is replaced by a fresh connection once.
+    Raises ``OSError`` on failure.
+    """
+    sock, reused = _checkout_socket(host, port, connect_timeout)
+    try:
+        sock.settimeout(write_timeout)
+        sock.sendall(data)
+    except OSError:
+        sock.close()
+        if not reused:
+            raise
+        sock = socket.create_connection((host, port), timeout=connect_timeout)
+        try:
+            sock.settimeout(write_timeout)
+            sock.sendall(data)
+        except OSError:
+            sock.close()
+            raise
+    _checkin_socket(host, port, sock)
+
+
+def _relay_send(session, hostname, auth, timeout, payload, headers=None):
+    response = session.post(hostname, json=payload, auth=auth, timeout=timeout, headers=headers)
+    response.raise_for_status()
+    return response
+
+
+def _raw_exchange(sock, data, timeout, replies):
+    """Send ``data`` and read ``replies`` ETX-terminated strings.
+
+    Returns ``(reply, open)``; ``open`` is False when the printer closed the
+    connection before answering in full.
+    """
+    sock.settimeout(timeout)
+    sock.sendall(data)
+    reply = b""
+    while reply.count(b"\x03") < replies:
+        received = sock.recv(1024)
+        if not received:
+            return reply, False
+        reply += received
+    return reply, True
+
+
+def _raw_query(host, port, data, timeout, replies=3):
+    """Send ``data`` on the printer's raw port and read ``replies`` ETX-terminated strings.
+
+    The pooled print socket is used when there is one: the printer accepts a
+    single raw connection, so a second one would wait for the idle one to
+    expire. A reused socket that fails is replaced by a fresh connection once.
+    """
+    sock, reused = _checkout_socket(host, port, timeout)
+    try:
+        reply, is_open = _raw_exchange(sock, data, timeout, replies)
+        if reused and not is_open and not reply:
+            raise ConnectionResetError("Pooled raw connection was closed by the printer.")
+    except OSError:
+        sock.close()
+        if not reused:
+            raise
+        sock = socket.create_connection((host, port), timeout=timeout)
+        try:
+            reply, is_open = _raw_exchange(sock, data, timeout, replies)
+        except OSError:
+            sock.close()
+            raise
+    if is_open:
+        _checkin_socket(host, port, sock)
+    else:
+        sock.close()
+    return reply.decode("ascii", "replace")
+
+
+def _relay_query(session, hostname, auth, timeout, payload):
+    """Post a query to the relay and return the printer's reply as text.
+
+    The relay answers either ``{"response": "..."}`` or the raw reply body.
+    """
+    response = _relay_send(session, hostname, auth, timeout, payload)
+    try:
+        data = response.json()
+    except ValueError:
+        return response.text
+    return (data.get("response") or "") if isinstance(data, dict) else str(data)
+
+
+def _parse_host_status(reply):
+    """Return ``(state, detail)`` from a ~HS reply.
+
+    Field positions follow the ZPL manual: string 1 carries paper out (1),
+    pause (2), corrupt RAM (9), under/over temperature (10, 11); string 2
+    carries head up (2) and ribbon out (3).
+    """
+    strings = HOST_STATUS_RE.findall(reply or "")
+    if len(strings) < 2:
+        return "unknown", f"Unexpected host status reply: {(reply or '')[:80]!r}"
+    first = strings[0].split(",")
+    second = strings[1].split(",")
+
+    def flag(values, index):
+        return len(values) > index and values[index].strip() == "1"
+
+    if flag(second, 2):
+        return "head_open", "Print head open"
+    if flag(first, 1):
+        return "paper_out", "Out of media"
+    if flag(second, 3):
+        return "ribbon_out", "Out of ribbon"
+    if flag(first, 9):
+        return "error", "Corrupt RAM"
+    if flag(first, 10):
+        return "error", "Under temperature"
+    if flag(first, 11):
+        return "error", "Over temperature"
+    if flag(first, 2):
+        return "paused", "Paused"
+    return "online", ""
+
+
+def _timed_query(query):
+    """Run a status ``query`` and return ``(state, detail, latency_seconds_or_None)``."""
+    started = time.monotonic()
+    try:
+        reply = query()
+    except SEND_ERRORS as exc:
+        return "offline", str(exc), None
+    latency = time.monotonic() - started
+    state, detail = _parse_host_status(reply)
+    return state, detail, latency
+
+
+def _is_transient(exc):
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return True
+
+
+def _breaker_before_call(key, cooldown):
+    """Fail fast while ``key``'s breaker is open; let one probe through after ``cooldown``."""
+    with _breaker_lock:
+        breaker = _breakers.get(key)
+        if not breaker or breaker["state"] == "closed":
+            return
+        if breaker["state"] == "open" and time.monotonic() - breaker["opened_at"] >= cooldown:
+            breaker["state"] = "half_open"
+            return
+        raise CircuitOpenError(
+            f"{key[-1]} is unavailable after {breaker['failures']} consecutive failures "
+            f"({breaker['last_error']}); calls are paused until a probe succeeds."
+        )
+
+
+def _breaker_record(key, error, threshold):
+    with _breaker_lock:
+        breaker = _breakers.setdefault(
+            key,
+            {"state": "closed", "failures": 0, "opened_at": 0.0, "opened_on": 0.0, "last_error": ""},
+        )
+        if error is None:
+            breaker.update(state="closed", failures=0, opened_on=0.0, last_error="")
+            return
+        breaker["failures"] += 1
+        breaker["last_error"] = str(error)
+        if breaker["state"] == "half_open" or breaker["failures"] >= threshold:
+            breaker.update(state="open", opened_at=time.monotonic(), opened_on=time.time())
+
+
+def _breaker_abort(key):
+    """Reopen ``key``'s breaker if its probe ended without a send outcome."""
+    with _breaker_lock:
+        breaker = _breakers.get(key)
+        if breaker and breaker["state"] == "half_open":
+            breaker.update(state="open", opened_at=time.monotonic())
+
+
+def _record_latency(printer_ip, seconds):
+    with _breaker_lock:
+        previous = _latencies.get(printer_ip)
+        _latencies[printer_ip] = (
+            seconds
+            if previous is None
+            else previous + LATENCY_SMOOTHING * (seconds - previous)
+        )
+
+
+def _preview_key(zpl, backend, dpi, width, height):
+    """Return the cache key of a preview: a hash of everything that shapes the image."""
+    digest = hashlib.sha256(f"{backend}\0{dpi}\0{width}\0{height}\0".encode())
+    digest.update(zpl.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _get_cached_preview(key):
+    with _preview_lock:
+        png = _previews.get(key)
+        if png is not None:
+            _previews.move_to_end(key)
+        return png
+
+
+def _cache_preview(key, png):
+    global _preview_bytes
+    if len(png) > PREVIEW_MEMORY_MAX_BYTES:
+        return
+    with _preview_lock:
+        previous = _previews.pop(key, None)
+        if previous is not None:
+            _preview_bytes -= len(previous)
+        _previews[key] = png
+        _preview_bytes += len(png)
+        while _preview_bytes > PREVIEW_MEMORY_MAX_BYTES:
+            _key, evicted = _previews.popitem(last=False)
+            _preview_bytes -= len(evicted)
+
+
+def _rasterize_previews(zpls, dpi, width, height, labelary=None):
+    """Render the first label of each ZPL, through ``labelary`` when given.
+
+    Runs without the ORM, so it can be called from worker threads. Returns
+    PNG bytes or a ``UserError`` per ZPL. Labelary renders single-label ZPLs
+    of one call in a single multi-label request.
+    """
+    if labelary is None:
+        results = []
+        for zpl in zpls:
+            try:
+                results.append(zpl_rasterizer.render_png(zpl, int(dpi), width, height))
+            except (ValueError, OSError) as exc:
+                results.append(UserError(f"Preview failed: {exc}"))
+        return results
+    single = [
+        index for index, zpl in enumerate(zpls) if len(zpl_rasterizer.FORMAT_RE.findall(zpl)) == 1
+    ]
+    results = [None] * len(zpls)
+    if len(single) > 1:
+        try:
+            pngs = labelary.render_many([zpls[index] for index in single], dpi, width, height)
+        except (requests.RequestException, labelary_client.LabelaryError):
+            # Render one by one below, so a single bad label does not fail the batch.
+            pass
+        else:
+            for index, png in zip(single, pngs):
+                results[index] = png
+    for index, zpl in enumerate(zpls):
+        if results[index] is None:
+            try:
+                results[index] = labelary.render(zpl, dpi, width, height)
+            except (requests.RequestException, labelary_client.LabelaryError) as exc:
+                results[index] = UserError(f"Preview failed: {exc}")
+    return results
+
+
+def _with_retry(send, key, retries, backoff, threshold, cooldown):
+    """Wrap ``send`` with retries (exponential backoff, full jitter) and a circuit breaker.
+
+    Only transient failures (network errors, timeouts, 429 and 5xx) are
+    retried and counted against the breaker of ``key``.
+    """
+
+    def call(zpl, qty=1, idempotency_key=None):
+        attempt = 0
+        while True:
+            _breaker_before_call(key, cooldown)
+            started = time.monotonic()
+            try:
+                result = send(zpl, qty, idempotency_key)
+            except SEND_ERRORS as exc:
+                if not _is_transient(exc):
+                    # The target answered, so it is reachable.
+                    _breaker_record(key, None, threshold)
+                    raise
+                _breaker_record(key, exc, threshold)
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                time.sleep(random.uniform(0, backoff * 2 ** attempt))
+                continue
+            except BaseException:
+                # Never leave a probe hanging in half_open: that would block
+                # every later call until the breakers are reset.
+                _breaker_abort(key)
+                raise
+            _breaker_record(key, None, threshold)
+            _record_latency(key[-1], time.monotonic() - started)
+            return result
+
+    return call
+
+
+def _send_in_order(send, payloads, on_sent=None):
+    """Send ``payloads`` one after another, stopping at the first failure.
+
+    Payloads are ZPL strings or ``(zpl, idempotency_key)`` pairs. Returns
+    ``(sent_count, exception_or_None, durations)`` where ``durations`` holds
+    the seconds each sent payload took. ``on_sent(index, seconds)`` is
+    called after each successful send.
+    """
+    durations = []
+    for payload in payloads:
+        zpl, idempotency_key = payload if isinstance(payload, tuple) else (payload, None)
+        started = time.monotonic()
+        try:
+            send(zpl, idempotency_key=idempotency_key)
+        except SEND_ERRORS as exc:
+            return len(durations), exc, durations
+        durations.append(time.monotonic() - started)
+        if on_sent:
+            on_sent(len(durations) - 1, durations[-1])
+    return len(durations), None, durations
+
+
+def _idempotency_key(scope, printer_ip, index, payload):
+    """Return the key identifying chunk ``index`` of submission ``scope`` on ``printer_ip``."""
+    content = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{scope}|{printer_ip}|{index}|{content}".encode("utf-8")).hexdigest()
+
+
+def _submission_key(scope, printer_ip):
+    """Return the key of a whole submission, whatever its chunking."""
+    return _idempotency_key(scope, printer_ip, "submission", "")
+
+
+def _split_weighted(items, weights, size=None):
+    """Split ``items`` into consecutive runs proportional to ``weights``.
+
+    ``weights`` maps a target to its share; ``size(item)`` gives the number
+    of labels an item stands for (1 by default). Returns ``{target: items}``
+    keeping the item order inside each run.
+    """
+    size = size or (lambda item: 1)
+    targets = [target for target, weight in weights.items() if weight > 0]
+    parts = {target: [] for target in targets}
+    if not targets:
+        return parts
+    counts = _split_count(sum(size(item) for item in items), weights)
+    index = 0
+    bound = 0
+    done = 0
+    for target in targets:
+        bound += counts[target]
+        while index < len(items) and (done < bound or target == targets[-1]):
+            parts[target].append(items[index])
+            done += size(items[index])
+            index += 1
+    return parts
+
+
+def _split_count(count, weights):
+    """Return ``{target: n}`` splitting ``count`` in proportion to ``weights``.
+
+    Uses largest-remainder rounding, so no target is favoured by its
+    position; this is also how :func:`_split_weighted` sizes its runs.
+    """
+    targets = [target for target, weight in weights.items() if weight > 0]
+    total_weight = sum(weights[target] for target in targets)
+    quotas = {target: count * weights[target] / total_weight for target in targets}
+    counts = {target: math.floor(quota) for target, quota in quotas.items()}
+    remainder = count - sum(counts.values())
+    by_fraction = sorted(targets, key=lambda target: counts[target] - quotas[target])
+    for target in by_fraction[:remainder]:
+        counts[target] += 1
+    return counts
+
+
+def _apply_quantity(zpl, qty):
+    """Fold ``qty`` into the label's ^PQ so it can share a payload with other labels."""
+    if not qty or qty <= 1:
+        return zpl
+    if PRINT_QUANTITY_RE.search(zpl):
+        return PRINT_QUANTITY_RE.sub(lambda match: f"^PQ{int(match.group(1)) * qty}", zpl)
+    return FORMAT_END_RE.sub(f"^PQ{qty}^XZ", zpl)
+
+
+def _chunk_labels(labels, max_bytes, max_labels):
+    """Concatenate ``labels`` into payloads of at most ``max_bytes`` / ``max_labels``.
+
+    Limits may also be zero-argument callables, read again before each label
+    so they can change while chunks are consumed. A single label larger than
+    ``max_bytes`` is still sent, on its own.
+    """
+    chunk = []
+    chunk_bytes = 0
+    for label in labels:
+        zpl, qty = label if isinstance(label, tuple) else (label, 1)
+        zpl = _apply_quantity(zpl or "", qty)
+        size = len(zpl.encode("utf-8"))
+        limit_bytes = max_bytes() if callable(max_bytes) else max_bytes
+        limit_labels = max_labels() if callable(max_labels) else max_labels
+        if chunk and (chunk_bytes + size > limit_bytes or len(chunk) >= limit_labels):
+            yield "".join(chunk)
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(zpl)
+        chunk_bytes += size
+    if chunk:
+        yield "".join(chunk)
+
+
+class AdaptiveChunker:
+    """Chunk labels by a payload size target that follows measured send latency.
+
+    The byte target grows by half while sends finish in under half of
+    ``target_latency`` and halves when they take more than 1.5 times it,
+    staying within ``[min_bytes, max_bytes]``. Feed each send duration to
+    :meth:`observe` before pulling the next chunk.
+    """
+
+    def __init__(self, target_bytes, min_bytes, max_bytes, max_labels, target_latency):
+        self.min_bytes = min(min_bytes, max_bytes)
+        self.max_bytes = max_bytes
+        self.max_labels = max_labels
+        self.target_latency = target_latency
+        self.target_bytes = min(max(target_bytes, self.min_bytes), self.max_bytes)
+        self.requests = 0
+        self.labels = 0
+        self.latencies = []
+
+    def observe(self, seconds, record=True):
+        if record:
+            self.latencies.append(seconds)
+        if seconds > self.target_latency * 1.5:
+            self.target_bytes = max(self.min_bytes, self.target_bytes // 2)
+        elif seconds < self.target_latency / 2:
+            self.target_bytes = min(self.max_bytes, int(self.target_bytes * 1.5))
+
+    def chunks(self, labels):
+        for chunk in _chunk_labels(labels, lambda: self.target_bytes, self.max_labels):
+            self.requests += 1
+            self.labels += len(FORMAT_END_RE.findall(chunk)) or 1
+            yield chunk
+
+    def summary(self):
+        return {
+            "requests": self.requests,
+            "labels": self.labels,
+            "labels_per_request": self.labels / self.requests if self.requests else 0.0,
+            "target_kb": self.target_bytes / 1024,
+            "avg_latency": sum(self.latencies) / len(self.latencies) if self.latencies else None,
+        }
 
 
 class NaturaPrintService(models.AbstractModel):
     _name = "natura.print.service"
     _description = "Natura Print Service"
 
-    def _get_api_config(self):
+    @api.model
+    @tools.ormcache()
+    def _get_config(self):
+        """Return the ``natura_print.*`` settings, parsed and cached per registry.
+
+        Keys are those of ``CONFIG_PARAMS``; unset or empty parameters take
+        their default. Writing a system parameter (directly or through
+        Settings) clears the registry cache, so changes apply immediately.
+        """
         params = self.env["ir.config_parameter"].sudo()
-        hostname = params.get_param("natura_print.hostname")
-        api_user = params.get_param("natura_print.api_user")
-        api_password = params.get_param("natura_print.api_password")
+        config = {}
+        for key, (cast, default) in CONFIG_PARAMS.items():
+            value = params.get_param(f"natura_print.{key}")
+            if cast is bool:
+                config[key] = bool(value) and value not in ("0", "False", "false")
+            else:
+                config[key] = cast(value) if value else default
+        return frozendict(config)
+
+    def _get_api_config(self):
+        config = self._get_config()
+        hostname = config["hostname"]
+        api_user = config["api_user"]
+        api_password = config["api_password"]
 
         if not hostname or not api_user or not api_password:
             raise UserError(
@@ -23,27 +683,657 @@ class NaturaPrintService(models.AbstractModel):
             )
         return hostname, api_user, api_password
 
-    def _post(self, hostname, api_user, api_password, payload, error_label="Print failed"):
-        try:
-            response = requests.post(
-                hostname,
-                json=payload,
-                auth=(api_user, api_password),
-                timeout=10,
+    def _get_http_options(self):
+        config = self._get_config()
+        return (
+            _get_http_session(max(config["pool_size"], 1)),
+            (config["connect_timeout"], config["read_timeout"]),
+        )
+
+    @api.model
+    @tools.ormcache("printer_ip")
+    def _get_printer_transport(self, printer_ip):
+        """Return ``(transport, port)`` of the printer registered under ``printer_ip``."""
+        printer = self.env["printers.list"].sudo().search([("ip_address", "=", printer_ip)], limit=1)
+        if not printer:
+            return "relay", None
+        return printer.transport or "relay", printer.raw_port or DEFAULT_RAW_PORT
+
+    def _get_sender(self, printer_ip):
+        """Return a ``send(zpl, qty=1, idempotency_key=None)`` callable for ``printer_ip``.
+
+        Printers set to the raw transport get ZPL streamed to their raw port;
+        everything else goes through the HTTP relay. Transient failures are
+        retried with backoff behind a per-target circuit breaker keyed by
+        relay host and printer IP. Configuration is resolved
+        up front, so the callable does not touch the environment and can run
+        in worker threads. It raises one of ``SEND_ERRORS`` on failure.
+        The relay receives ``idempotency_key`` in the payload and as an
+        ``Idempotency-Key`` header so it can drop repeats; raw sends ignore it.
+        """
+        transport, port = self._get_printer_transport(printer_ip)
+        config = self._get_config()
+        retry_policy = (
+            config["send_retries"],
+            config["retry_backoff"],
+            config["breaker_threshold"],
+            config["breaker_cooldown"],
+        )
+        if transport == "raw":
+            connect_timeout = config["raw_connect_timeout"]
+            write_timeout = config["raw_write_timeout"]
+
+            def send(zpl, qty=1, idempotency_key=None):
+                data = _apply_quantity(zpl or "", qty).encode("utf-8")
+                return _raw_send(printer_ip, port, data, connect_timeout, write_timeout)
+
+            return _with_retry(send, ("raw", port, printer_ip), *retry_policy)
+
+        hostname, api_user, api_password = self._get_api_config()
+        session, timeout = self._get_http_options()
+
+        def send(zpl, qty=1, idempotency_key=None):
+            payload = {
+                "zpl": zpl or "",
+                "printer_ip": printer_ip,
+                "qty": qty or 1,
+            }
+            headers = None
+            if idempotency_key:
+                payload["idempotency_key"] = idempotency_key
+                headers = {"Idempotency-Key": idempotency_key}
+            return _relay_send(
+                session, hostname, (api_user, api_password), timeout, payload, headers
             )
-            response.raise_for_status()
-        except requests.RequestException as exc:
-            raise UserError(_("%s: %s") % (error_label, exc)) from exc
-        return response
 
-    def print_zpl(self, zpl, printer_ip, qty=1, error_label="Print failed"):
+        return _with_retry(send, ("relay", hostname, printer_ip), *retry_policy)
+
+    @api.model
+    def _get_breaker_status(self, printer_ip):
+        """Return this worker's breaker state for ``printer_ip`` (worst over all targets)."""
+        rank = {"closed": 0, "half_open": 1, "open": 2}
+        status = {"state": "closed", "failures": 0, "opened_on": 0.0, "last_error": ""}
+        with _breaker_lock:
+            for key, breaker in _breakers.items():
+                if key[-1] == printer_ip and rank[breaker["state"]] >= rank[status["state"]]:
+                    status = dict(breaker)
+        return status
+
+    @api.model
+    def _reset_breakers(self, printer_ip):
+        with _breaker_lock:
+            for key in [key for key in _breakers if key[-1] == printer_ip]:
+                del _breakers[key]
+
+    def _get_status_query(self, printer_ip):
+        """Return an env-free callable asking ``printer_ip`` for its ~HS host status."""
+        transport, port = self._get_printer_transport(printer_ip)
+        timeout = self._get_config()["status_timeout"]
+        if transport == "raw":
+            data = HOST_STATUS_QUERY.encode("ascii")
+            return lambda: _raw_query(printer_ip, port, data, timeout)
+
         hostname, api_user, api_password = self._get_api_config()
-        payload = {
-            "zpl": zpl or "",
-            "printer_ip": printer_ip,
-            "qty": qty or 1,
+        session, _timeout = self._get_http_options()
+        payload = {"zpl": HOST_STATUS_QUERY, "printer_ip": printer_ip, "query": True}
+        return lambda: _relay_query(
+            session, hostname, (api_user, api_password), (timeout, timeout), payload
+        )
+
+    @api.model
+    def _poll_printers(self, printers):
+        """Query the host status of ``printers`` concurrently and store it on them."""
+        now = fields.Datetime.now()
+        results = {}
+        queries = {}
+        for printer in printers:
+            try:
+                queries[printer] = self._get_status_query(printer.ip_address)
+            except UserError as exc:
+                results[printer] = ("unknown", str(exc), None)
+        if queries:
+            max_workers = max(1, min(self._get_config()["status_poll_workers"], len(queries)))
+            with ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="natura_print_status"
+            ) as executor:
+                futures = {
+                    printer: executor.submit(_timed_query, query)
+                    for printer, query in queries.items()
+                }
+            results.update((printer, future.result()) for printer, future in futures.items())
+
+        for printer, (state, detail, latency) in results.items():
+            vals = {
+                "status": state,
+                "status_detail": detail or False,
+                "status_checked_on": now,
+            }
+            if latency is not None:
+                vals.update(last_seen=now, latency_ms=int(latency * 1000))
+            printer.write(vals)
+        return True
+
+    @api.model
+    def _get_unavailable_printers(self, printer_ips):
+        """Return ``{printer_ip: reason}`` for printers recently polled as down."""
+        max_age = self._get_config()["status_max_age"]
+        if not printer_ips or max_age <= 0:
+            return {}
+        printers = self.env["printers.list"].sudo().search(
+            [
+                ("ip_address", "in", list(printer_ips)),
+                ("status", "in", PRINTER_DOWN_STATES),
+                ("status_checked_on", ">=", fields.Datetime.now() - timedelta(seconds=max_age)),
+            ]
+        )
+        states = dict(printers._fields["status"]._description_selection(self.env))
+        return {
+            printer.ip_address: _("%(printer)s is %(state)s%(detail)s (checked %(date)s UTC)")
+            % {
+                "printer": printer.display_name,
+                "state": states[printer.status].lower(),
+                "detail": f": {printer.status_detail}" if printer.status_detail else "",
+                "date": printer.status_checked_on,
+            }
+            for printer in printers
+        }
+
+    def _check_printer_available(self, printer_ip, error_label="Print failed"):
+        reason = self._get_unavailable_printers([printer_ip]).get(printer_ip)
+        if reason:
+            raise UserError(_("%s: %s") % (error_label, reason))
+
+    @api.model
+    def _claim_idempotency_keys(self, keys_by_printer, durable=True):
+        """Return the keys of ``{key: printer_ip}`` not sent within the idempotency window.
+
+        Durable claims are recorded in their own transaction, so they hold
+        even if the calling transaction rolls back after sending; release the
+        ones whose payload could not be delivered with
+        :meth:`_release_idempotency_keys`. Other claims follow the current
+        transaction.
+        """
+        window = self._get_config()["idempotency_window"]
+        if window <= 0 or not keys_by_printer:
+            return set(keys_by_printer)
+        if not durable:
+            return self.env["natura.print.idempotency.key"].sudo()._claim(keys_by_printer, window)
+        with self.env.registry.cursor() as cr:
+            keys = self.env(cr=cr)["natura.print.idempotency.key"].sudo()
+            return keys._claim(keys_by_printer, window)
+
+    def _already_submitted_error(self):
+        window = self._get_config()["idempotency_window"]
+        return UserError(
+            _(
+                "These labels were already sent or queued less than %s seconds ago. "
+                "Check the print jobs before printing them again."
+            )
+            % window
+        )
+
+    @api.model
+    def _get_sent_idempotency_keys(self, keys):
+        """Return the ``keys`` already sent within the idempotency window, claiming none."""
+        window = self._get_config()["idempotency_window"]
+        if window <= 0:
+            return set()
+        return self.env["natura.print.idempotency.key"].sudo()._find_recent(keys, window)
+
+    @api.model
+    def _release_idempotency_keys(self, keys):
+        if not keys:
+            return
+        with self.env.registry.cursor() as cr:
+            self.env(cr=cr)["natura.print.idempotency.key"].sudo()._release(keys)
+
+    def print_zpl(
+        self, zpl, printer_ip, qty=1, error_label="Print failed", idempotency_scope=None
+    ):
+        """Send one payload to ``printer_ip``.
+
+        Every payload carries an idempotency key. When ``idempotency_scope``
+        identifies the submission (a wizard, a job batch...), repeating it
+        within the idempotency window sends nothing and returns ``False``.
+        """
+        self._check_printer_available(printer_ip, error_label)
+        send = self._get_sender(printer_ip)
+        key = _idempotency_key(
+            idempotency_scope or uuid.uuid4().hex, printer_ip, 0, _apply_quantity(zpl or "", qty)
+        )
+        if idempotency_scope and not self._claim_idempotency_keys({key: printer_ip}):
+            return False
+        try:
+            return send(zpl, qty=qty, idempotency_key=key)
+        except SEND_ERRORS as exc:
+            if idempotency_scope:
+                self._release_idempotency_keys([key])
+            raise UserError(_("%s: %s") % (error_label, exc)) from exc
+
+    def _dispatch_parallel(self, payloads_by_printer, on_sent=None):
+        """Send payload lists to several printers concurrently.
+
+        Each printer's payloads go out in order from a single worker thread,
+        while different printers run side by side in a bounded pool. Returns
+        ``{printer_ip: (sent_count, exception_or_None, durations)}``. Printers polled
+        as down get a :class:`PrinterUnavailableError` without being contacted.
+        ``on_sent(printer_ip, index, seconds)`` is called in the calling
+        thread as soon as each payload is sent, so it may use the ORM.
+        """
+        unavailable = self._get_unavailable_printers(payloads_by_printer)
+        results = {
+            ip: (0, PrinterUnavailableError(reason), []) for ip, reason in unavailable.items()
+        }
+        payloads_by_printer = {
+            ip: payloads for ip, payloads in payloads_by_printer.items() if ip not in unavailable
+        }
+        senders = {ip: self._get_sender(ip) for ip in payloads_by_printer}
+        if len(senders) <= 1:
+            results.update(
+                (ip, _send_in_order(senders[ip], payloads, on_sent and partial(on_sent, ip)))
+                for ip, payloads in payloads_by_printer.items()
+            )
+            return results
+        # Sender threads report sends through a queue; on_sent runs here.
+        sent_queue = queue.SimpleQueue()
+
+        def report(ip):
+            return lambda index, seconds: sent_queue.put((ip, index, seconds))
+
+        max_workers = self._get_config()["max_parallel_printers"]
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(senders))),
+            thread_name_prefix="natura_print",
+        ) as executor:
+            futures = {
+                ip: executor.submit(
+                    _send_in_order,
+                    senders[ip],
+                    payloads,
+                    on_sent and report(ip),
+                )
+                for ip, payloads in payloads_by_printer.items()
+            }
+            while on_sent and not (
+                all(future.done() for future in futures.values()) and sent_queue.empty()
+            ):
+                try:
+                    on_sent(*sent_queue.get(timeout=0.1))
+                except queue.Empty:
+                    pass
+        results.update((ip, future.result()) for ip, future in futures.items())
+        return results
+
+    def _get_chunk_limits(self, max_bytes=None, max_labels=None):
+        config = self._get_config()
+        max_bytes = max_bytes or config["chunk_max_bytes"]
+        max_labels = max_labels or config["chunk_max_labels"]
+        return max_bytes, max(max_labels, 1)
+
+    def print_zpl_many(
+        self,
+        labels,
+        printer_ip,
+        error_label="Print failed",
+        max_bytes=None,
+        max_labels=None,
+        chunker=None,
+        idempotency_scope=None,
+    ):
+        """Send ``labels`` to ``printer_ip`` in as few relay requests as possible.
+
+        ``labels`` yields ZPL strings or ``(zpl, qty)`` pairs. Quantities are
+        folded into ^PQ so labels can share a payload, and payloads are cut
+        at ``max_bytes`` / ``max_labels`` (Settings defaults when omitted), or
+        by ``chunker`` (see :meth:`_get_adaptive_chunker`), which is told the
+        duration of every send. Chunks already sent for ``idempotency_scope``
+        are skipped (see :meth:`print_zpl`). Returns the number of requests sent.
+        """
+        if chunker:
+            chunks = chunker.chunks(labels)
+        else:
+            chunks = _chunk_labels(labels, *self._get_chunk_limits(max_bytes, max_labels))
+        self._check_printer_available(printer_ip, error_label)
+        send = self._get_sender(printer_ip)
+        scope = idempotency_scope or uuid.uuid4().hex
+        # The submission claim follows this transaction: a run that does not
+        # finish can be submitted again, and only its unsent chunks go out.
+        if idempotency_scope and not self._claim_idempotency_keys(
+            {_submission_key(scope, printer_ip): printer_ip}, durable=False
+        ):
+            raise self._already_submitted_error()
+        durations = []
+        for index, chunk in enumerate(chunks):
+            key = _idempotency_key(scope, printer_ip, index, chunk)
+            if idempotency_scope and not self._claim_idempotency_keys({key: printer_ip}):
+                continue
+            started = time.monotonic()
+            try:
+                send(chunk, idempotency_key=key)
+            except SEND_ERRORS as exc:
+                if idempotency_scope:
+                    # Let the user resubmit; chunks already sent stay claimed.
+                    self._release_idempotency_keys([key])
+                raise UserError(_("%s: %s") % (error_label, exc)) from exc
+            durations.append(time.monotonic() - started)
+            if chunker:
+                chunker.observe(durations[-1])
+        self._record_send_latency(printer_ip, durations)
+        return len(durations)
+
+    def _record_send_latency(self, printer_ip, durations):
+        """Fold send ``durations`` into the printer's stored smoothed send latency.
+
+        Stored on ``printers.list`` rather than per worker, so chunkers built
+        in any worker start from what the job worker measured. Written in its
+        own transaction after the send, so a concurrent write to the printer
+        (e.g. the status poller) can neither fail nor replay the print; such
+        a measurement is dropped.
+        """
+        if not durations:
+            return
+        try:
+            with self.env.registry.cursor() as cr:
+                printers = self.env(cr=cr)["printers.list"].sudo().search(
+                    [("ip_address", "=", printer_ip)]
+                )
+                if not printers:
+                    return
+                latency = printers[0].send_latency
+                for seconds in durations:
+                    latency = (
+                        seconds if not latency else latency + LATENCY_SMOOTHING * (seconds - latency)
+                    )
+                printers.write({"send_latency": latency})
+        except psycopg2.Error as exc:
+            _logger.info("Send latency of %s not recorded: %s", printer_ip, exc)
+
+    def _get_adaptive_chunker(self, printer_ip):
+        """Return an :class:`AdaptiveChunker` seeded with the printer's recent latency.
+
+        The stored send latency (see :meth:`_record_send_latency`) is used
+        first, so queued runs adapt to the sends of the job worker; printers
+        that are not listed fall back to this worker's measurements.
+        """
+        config = self._get_config()
+        max_bytes, max_labels = self._get_chunk_limits()
+        chunker = AdaptiveChunker(
+            target_bytes=config["adaptive_target_bytes"],
+            min_bytes=ADAPTIVE_MIN_BYTES,
+            max_bytes=max_bytes,
+            max_labels=max_labels,
+            target_latency=config["adaptive_target_latency"],
+        )
+        printer = self.env["printers.list"].sudo().search(
+            [("ip_address", "=", printer_ip), ("send_latency", ">", 0)], limit=1
+        )
+        latency = printer.send_latency or None
+        if latency is None:
+            with _breaker_lock:
+                latency = _latencies.get(printer_ip)
+        if latency is not None:
+            chunker.observe(latency, record=False)
+        return chunker
+
+    def print_zpl_multi(
+        self,
+        labels_by_printer,
+        error_label="Print failed",
+        max_bytes=None,
+        max_labels=None,
+        idempotency_scope=None,
+    ):
+        """Like :meth:`print_zpl_many` for several printers at once.
+
+        ``labels_by_printer`` maps printer IP to labels; printers are served
+        concurrently and each keeps its label order. Returns the number of
+        requests sent.
+        """
+        max_bytes, max_labels = self._get_chunk_limits(max_bytes, max_labels)
+        scope = idempotency_scope or uuid.uuid4().hex
+        payloads_by_printer = {}
+        for ip, labels in labels_by_printer.items():
+            payloads_by_printer[ip] = [
+                (chunk, _idempotency_key(scope, ip, index, chunk))
+                for index, chunk in enumerate(_chunk_labels(labels, max_bytes, max_labels))
+            ]
+        if idempotency_scope:
+            submission_keys = {_submission_key(scope, ip): ip for ip in payloads_by_printer}
+            if self._claim_idempotency_keys(submission_keys, durable=False) != set(
+                submission_keys
+            ):
+                raise self._already_submitted_error()
+            claimed = self._claim_idempotency_keys(
+                {
+                    key: ip
+                    for ip, payloads in payloads_by_printer.items()
+                    for _zpl, key in payloads
+                }
+            )
+            payloads_by_printer = {
+                ip: [payload for payload in payloads if payload[1] in claimed]
+                for ip, payloads in payloads_by_printer.items()
+            }
+        results = self._dispatch_parallel(payloads_by_printer)
+        for ip, (_sent, _exc, durations) in results.items():
+            self._record_send_latency(ip, durations)
+        if idempotency_scope:
+            # Let the user resubmit to printers that failed; sent chunks stay claimed.
+            unsent = []
+            for ip, (sent, exc, _durations) in results.items():
+                if exc:
+                    unsent.extend(key for _zpl, key in payloads_by_printer[ip][sent:])
+            self._release_idempotency_keys(unsent)
+        errors = [f"{ip}: {exc}" for ip, (_sent, exc, _durations) in results.items() if exc]
+        if errors:
+            raise UserError(_("%s: %s") % (error_label, "; ".join(errors)))
+        return sum(sent for sent, _exc, _durations in results.values())
+
+    def enqueue_zpl_many(
+        self,
+        labels,
+        printer_ip,
+        name=None,
+        max_bytes=None,
+        max_labels=None,
+        chunker=None,
+        idempotency_scope=None,
+        batch_ref=None,
+    ):
+        """Queue ``labels`` as ``natura.print.job`` chunks and wake the job worker.
+
+        Takes the same ``labels`` as :meth:`print_zpl_many`; returns the jobs.
+        Each job gets an idempotency key from ``idempotency_scope`` (its batch
+        by default), so the worker skips chunks already sent for it. Pass
+        ``batch_ref`` to add the jobs to a batch started by
+        :meth:`_new_batch_ref`.
+        """
+        if not printer_ip:
+            raise UserError(_("Missing printer IP address."))
+        if chunker:
+            chunks = chunker.chunks(labels)
+        else:
+            chunks = _chunk_labels(labels, *self._get_chunk_limits(max_bytes, max_labels))
+        jobs = self.env["natura.print.job"].sudo()
+        batch_ref = batch_ref or uuid.uuid4().hex
+        scope = idempotency_scope or batch_ref
+        if idempotency_scope and not self._claim_idempotency_keys(
+            {_submission_key(scope, printer_ip): printer_ip}, durable=False
+        ):
+            # Already queued by an identical submission (double click).
+            raise self._already_submitted_error()
+        vals_list = []
+        for index, chunk in enumerate(chunks):
+            vals_list.append(
+                {
+                    "name": name or _("Labels"),
+                    "printer_ip": printer_ip,
+                    "payload": chunk,
+                    "label_count": len(FORMAT_END_RE.findall(chunk)) or 1,
+                    "batch_ref": batch_ref,
+                    "chunk_index": index,
+                    "idempotency_key": _idempotency_key(scope, printer_ip, index, chunk),
+                }
+            )
+            if len(vals_list) >= JOB_CREATE_BATCH:
+                jobs |= self._create_jobs(vals_list)
+                vals_list = []
+        jobs |= self._create_jobs(vals_list)
+        if jobs:
+            jobs._trigger_processing()
+        return jobs
+
+    def _create_jobs(self, vals_list):
+        """Create print jobs and drop their payloads from the cache, so a long
+        run holds at most ``JOB_CREATE_BATCH`` payloads in memory."""
+        jobs = self.env["natura.print.job"].sudo().create(vals_list)
+        jobs.flush_recordset()
+        jobs.invalidate_recordset(["payload"])
+        return jobs
+
+    def submit_zpl_many(
+        self,
+        labels,
+        printer_ip,
+        name=None,
+        max_bytes=None,
+        max_labels=None,
+        chunker=None,
+        idempotency_scope=None,
+        batch_ref=None,
+    ):
+        """Queue ``labels`` for the background worker, or print them now in direct mode."""
+        options = {
+            "max_bytes": max_bytes,
+            "max_labels": max_labels,
+            "chunker": chunker,
+            "idempotency_scope": idempotency_scope,
         }
-        return self._post(hostname, api_user, api_password, payload, error_label=error_label)
+        if self._get_config()["direct_print"]:
+            return self.print_zpl_many(labels, printer_ip, **options)
+        return self.enqueue_zpl_many(labels, printer_ip, name=name, batch_ref=batch_ref, **options)
+
+    def _new_batch_ref(self):
+        """Return the reference of a new print job batch, or None in direct mode.
+
+        Pass it to :meth:`_get_label_renderer` and the ``submit_*`` methods,
+        so stored format downloads are queued ahead of the labels.
+        """
+        return None if self._get_config()["direct_print"] else uuid.uuid4().hex
+
+    def submit_zpl_multi(
+        self, labels_by_printer, name=None, idempotency_scope=None, batch_ref=None
+    ):
+        """Like :meth:`submit_zpl_many` for several printers at once."""
+        if self._get_config()["direct_print"]:
+            return self.print_zpl_multi(labels_by_printer, idempotency_scope=idempotency_scope)
+        jobs = self.env["natura.print.job"]
+        for printer_ip, labels in labels_by_printer.items():
+            jobs |= self.enqueue_zpl_many(
+                labels,
+                printer_ip,
+                name=name,
+                idempotency_scope=idempotency_scope,
+                batch_ref=batch_ref,
+            )
+        return jobs
+
+    @api.model
+    def _get_pool_weights(self, pool):
+        """Return ``{printer_ip: weight}`` for the healthy members of ``pool``.
+
+        Members are weighted by their measured throughput; members without
+        history get the average of the others (or an equal share).
+        """
+        members = pool.printer_ids.filtered("active")
+        unavailable = self._get_unavailable_printers(members.mapped("ip_address"))
+        healthy = members.filtered(
+            lambda printer: printer.ip_address not in unavailable
+            and self._get_breaker_status(printer.ip_address)["state"] != "open"
+        )
+        if not healthy:
+            raise UserError(
+                _("No printer of pool %(pool)s is available.%(reasons)s")
+                % {
+                    "pool": pool.display_name,
+                    "reasons": "".join(f"\n{reason}" for reason in unavailable.values()),
+                }
+            )
+        measured = [rate for rate in healthy.mapped("throughput") if rate > 0]
+        fallback = sum(measured) / len(measured) if measured else 1.0
+        weights = {}
+        for printer in healthy:
+            weights[printer.ip_address] = weights.get(printer.ip_address, 0.0) + (
+                printer.throughput or fallback
+            )
+        return weights
+
+    @api.model
+    def _distribute(self, items, printer_ip=False, pool=False, size=None, count=None):
+        """Return ``{printer_ip: items}`` for a print targeting a printer or a pool.
+
+        Without ``pool`` everything goes to ``printer_ip`` (``items`` is left
+        as is, so it may be a generator). With a pool, ``items`` is split in
+        consecutive runs across its healthy members by :meth:`_get_pool_weights`;
+        ``size(item)`` counts the labels of an item. Passing the number of
+        items as ``count`` keeps a generator lazy: each run is then an
+        iterator over the shared ``items`` and the runs must be consumed in
+        order.
+        """
+        if not pool:
+            if not printer_ip:
+                raise UserError(_("Select a printer or a printer pool."))
+            return {printer_ip: items}
+        if count is not None:
+            items = iter(items)
+            counts = _split_count(count, self._get_pool_weights(pool))
+            return {ip: islice(items, part) for ip, part in counts.items() if part}
+        parts = _split_weighted(list(items), self._get_pool_weights(pool), size)
+        return {ip: part for ip, part in parts.items() if part}
+
+    def submit_labels(
+        self, template, items, printer_ip=False, pool=False, name=None, idempotency_scope=None
+    ):
+        """Render ``(values, qty)`` pairs with ``template`` and submit them.
+
+        Labels go to ``printer_ip``, or are split across ``pool`` (see
+        :meth:`_distribute`) and rendered for each member printer.
+        """
+        labels_by_printer = {}
+        batch_ref = self._new_batch_ref()
+        parts = self._distribute(items, printer_ip, pool, size=lambda item: item[1] or 1)
+        for ip, part in parts.items():
+            render = self._get_label_renderer(template, ip, batch_ref=batch_ref)
+            labels_by_printer[ip] = [(render(values), qty) for values, qty in part]
+        return self.submit_zpl_multi(
+            labels_by_printer, name=name, idempotency_scope=idempotency_scope, batch_ref=batch_ref
+        )
+
+    def submit_record_labels(self, wizard, lines, record_field, name=None):
+        """Submit the labels of a record label wizard.
+
+        ``lines`` carry the record to print in ``record_field`` and a
+        ``qty``; the wizard gives the template, printer or pool. A
+        double-clicked Print submits the same wizard twice, so the wizard is
+        the idempotency scope and its labels are sent once.
+        """
+        wizard.ensure_one()
+        lines = lines.filtered(record_field)
+        records = self.env[lines._fields[record_field].comodel_name].browse(
+            [line[record_field].id for line in lines]
+        )
+        items = [
+            (values, line.qty or 1)
+            for line, values in zip(lines, wizard.template_id._values_many(records))
+        ]
+        return self.submit_labels(
+            wizard.template_id,
+            items,
+            printer_ip=wizard.printer_id.ip_address,
+            pool=wizard.pool_id,
+            idempotency_scope=f"{wizard._name},{wizard.id}",
+            name=name,
+        )
 
     def resolve_template(
         self,
@@ -108,14 +1398,215 @@ class NaturaPrintService(models.AbstractModel):
         printer = self.env.user.natura_print_default_printer_id
         return printer.ip_address if printer else ""
 
+    def _ensure_stored_format(
+        self, template, printer_ip, error_label="Print failed", batch_ref=None
+    ):
+        """Download ``template``'s stored format to ``printer_ip`` unless already there.
+
+        Downloads are tracked per printer by format name and hash, so each
+        format is sent once; the superseded format is deleted from the printer
+        in the same payload unless another template's download still uses it.
+        With ``batch_ref``, the download is queued as the first job of that
+        batch (chunk -1) and tracked once the job worker sends it.
+        """
+        stored = template._get_stored_format()
+        if not stored or not printer_ip:
+            return None
+        Tracking = self.env["natura.print.stored.format"].sudo()
+        tracking = Tracking._lock_tracking(template.id, printer_ip)
+        if tracking.format_hash == stored.hash and tracking.format_name == stored.name:
+            return stored
+
+        zpl = stored.zpl
+        old_name = tracking.format_name
+        if old_name and old_name != stored.name and not Tracking.search_count(
+            [
+                ("printer_ip", "=", printer_ip),
+                ("format_name", "=", old_name),
+                ("id", "!=", tracking.id),
+            ],
+            limit=1,
+        ):
+            zpl = f"^XA^ID{old_name}^FS^XZ{zpl}"
+        if batch_ref:
+            self._create_jobs(
+                [
+                    {
+                        "name": _("Stored format: %s") % template.display_name,
+                        "printer_ip": printer_ip,
+                        "payload": zpl,
+                        "label_count": 0,
+                        "batch_ref": batch_ref,
+                        "chunk_index": -1,
+                        "stored_format_id": tracking.id,
+                        "format_name": stored.name,
+                        "format_hash": stored.hash,
+                    }
+                ]
+            )._trigger_processing()
+            return stored
+        self.print_zpl(zpl, printer_ip, qty=1, error_label=error_label)
+
+        tracking.write(
+            {
+                "format_name": stored.name,
+                "format_hash": stored.hash,
+                "download_date": fields.Datetime.now(),
+            }
+        )
+        return stored
+
+    def _get_label_renderer(
+        self, template, printer_ip, error_label="Print failed", batch_ref=None
+    ):
+        """Return a ``values -> zpl`` callable for printing ``template`` on ``printer_ip``.
+
+        Templates in stored-format mode render to a short ^XF recall once the
+        format is on the printer (or queued for it in ``batch_ref``, see
+        :meth:`_ensure_stored_format`); all others render the full ZPL.
+        """
+        template.ensure_one()
+        stored = self._ensure_stored_format(
+            template, printer_ip, error_label=error_label, batch_ref=batch_ref
+        )
+        if stored:
+            return lambda values: template._render_stored_recall(stored, values)
+        return template._render_zpl_from_values
+
     def print_record(self, record, template, printer_ip, qty=1, overrides=None, error_label="Print failed"):
         template.ensure_one()
 
+        values = template._values_from_record(record)
         if overrides:
-            values = template._values_from_record(record) if record else {}
             values.update({str(k): "" if v is None else v for k, v in overrides.items()})
-            zpl = template._render_zpl_from_values(values)
-        else:
-            zpl = template._render_zpl(record)
+        render = self._get_label_renderer(template, printer_ip, error_label=error_label)
+        return self.print_zpl(render(values), printer_ip, qty=qty, error_label=error_label)
+
+    def print_records(
+        self, records, template, printer_ip, qty=1, overrides=None, error_label="Print failed"
+    ):
+        template.ensure_one()
+
+        overrides = {str(k): "" if v is None else v for k, v in (overrides or {}).items()}
+        render = self._get_label_renderer(template, printer_ip, error_label=error_label)
+        labels = [
+            (zpl, qty or 1)
+            for zpl in template.render_many(records, render=render, overrides=overrides)
+        ]
+        return self.print_zpl_many(labels, printer_ip, error_label=error_label)
+
+    def _render_preview(self, zpl, dpi, width, height, cached_only=False):
+        """Return the PNG bytes of the first label of ``zpl``.
+
+        With ``cached_only``, return None instead of rendering a preview that
+        is not cached yet.
+        """
+        result = self._render_previews([(zpl, dpi, width, height)], cached_only=cached_only)[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _render_previews(self, specs, cached_only=False):
+        """Render ``(zpl, dpi, width, height)`` previews, several at a time.
+
+        Returns PNG bytes or a ``UserError`` per spec, in order (None for
+        uncached previews with ``cached_only``). Previews are cached by a
+        hash of the ZPL, backend, DPI and size: in memory per worker, then as
+        attachments shared by all workers (see ``_get_preview_attachments``).
+        """
+        backend = self._get_config()["preview_backend"]
+        keys = [_preview_key(zpl, backend, dpi, width, height) for zpl, dpi, width, height in specs]
+        pngs = {key: _get_cached_preview(key) for key in keys}
+        missing = {key: spec for key, spec in zip(keys, specs) if pngs[key] is None}
+        if missing:
+            results = self._get_preview_attachments(list(missing.values()), cached_only=cached_only)
+            for key, result in zip(missing, results):
+                if isinstance(result, models.BaseModel):
+                    pngs[key] = result.raw
+                    _cache_preview(key, pngs[key])
+                else:
+                    pngs[key] = result
+        return [pngs[key] for key in keys]
+
+    def _get_preview_attachments(self, specs, cached_only=False):
+        """Return the cached preview attachment of each ``(zpl, dpi, width, height)``.
+
+        Previews not cached yet are rendered (or None with ``cached_only``);
+        a failed render gives a ``UserError`` instead of an attachment.
+        Attachments live on this model, named after the preview key, and are
+        removed by ``_gc_preview_cache``. Forms can show them without copying
+        the image into their own records.
+        """
+        backend = self._get_config()["preview_backend"]
+        keys = [_preview_key(zpl, backend, dpi, width, height) for zpl, dpi, width, height in specs]
+        attachments = self.env["ir.attachment"].sudo()
+        found = {
+            attachment.name[:-4]: attachment
+            for attachment in attachments.search(
+                [("res_model", "=", self._name), ("name", "in", [f"{key}.png" for key in keys])]
+            )
+        }
+        missing = {key: spec for key, spec in zip(keys, specs) if key not in found}
+        errors = {}
+        if missing and not cached_only:
+            labelary = self._get_labelary_client() if backend == "labelary" else None
+            # Labelary batches labels of one size per request; the local
+            # rasterizer renders each label in its own task.
+            tasks = {}
+            for key, (zpl, dpi, width, height) in missing.items():
+                group = (dpi, width, height) if labelary else (dpi, width, height, key)
+                tasks.setdefault(group, []).append((key, zpl))
+
+            def render(item):
+                (dpi, width, height, *_key), todo = item
+                pngs = _rasterize_previews([zpl for _key, zpl in todo], dpi, width, height, labelary)
+                return [(key, png) for (key, _zpl), png in zip(todo, pngs)]
+
+            if len(tasks) == 1:
+                done = map(render, tasks.items())
+            else:
+                with ThreadPoolExecutor(max_workers=min(PREVIEW_WORKERS, len(tasks))) as executor:
+                    done = list(executor.map(render, tasks.items()))
+            rendered = {}
+            for key, png in (item for results in done for item in results):
+                if isinstance(png, Exception):
+                    errors[key] = png
+                else:
+                    rendered[key] = png
+            # Keep images as rendered; attachments resize large images by default.
+            created = attachments.with_context(image_no_postprocess=True).create(
+                [
+                    {
+                        "name": f"{key}.png",
+                        "res_model": self._name,
+                        "mimetype": "image/png",
+                        "raw": png,
+                    }
+                    for key, png in rendered.items()
+                ]
+            )
+            for attachment, (key, png) in zip(created, rendered.items()):
+                found[key] = attachment
+                _cache_preview(key, png)
+        return [found.get(key) or errors.get(key) for key in keys]
+
+    def _get_labelary_client(self):
+        config = self._get_config()
+        return labelary_client.get_client(config["labelary_url"], config["labelary_rate"])
 
-        return self.print_zpl(zpl, printer_ip, qty=qty, error_label=error_label)
+    @api.autovacuum
+    def _gc_preview_cache(self):
+        """Drop cached previews older than the configured age, then the oldest
+        ones until the cache fits its size limit."""
+        config = self._get_config()
+        attachments = self.env["ir.attachment"].sudo()
+        domain = [("res_model", "=", self._name), ("name", "=like", "%.png")]
+        cutoff = fields.Datetime.now() - timedelta(days=config["preview_cache_days"])
+        attachments.search(domain + [("create_date", "<", cutoff)]).unlink()
+        total = 0
+        stale = []
+        for row in attachments.search_read(domain, ["file_size"], order="create_date desc, id desc"):
+            total += row["file_size"] or 0
+            if total > config["preview_cache_max_bytes"]:
+                stale.append(row["id"])
+        attachments.browse(stale).unlink()
@@ -27,6 +27,24 @@ class NaturaPrintPlaceholderPath(models.Model):
         readonly=True,
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        # Placeholder field paths are cached on the template, see
+        # zpl.label.template._get_placeholder_paths().
+        self.env.registry.clear_cache()
+        return lines
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
     @api.depends("field_id")
     def _compute_relation_model(self):
         for line in self:
@@ -0,0 +1,212 @@
+import threading
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.exceptions import UserError
+
+from .natura_print_service import PrinterUnavailableError
+
+DEFAULT_JOB_BATCH_LIMIT = 200
+JOB_RETENTION_DAYS = 7
+
+
+class NaturaPrintJob(models.Model):
+    _name = "natura.print.job"
+    _description = "Natura Print Job"
+    _order = "id desc"
+
+    name = fields.Char(string="Description", required=True, default="Labels")
+    printer_ip = fields.Char(string="Printer IP", required=True, index=True)
+    payload = fields.Text(string="ZPL Payload", required=True)
+    label_count = fields.Integer(string="Labels", default=1)
+    batch_ref = fields.Char(
+        string="Batch",
+        index=True,
+        help="Groups the jobs enqueued by a single print action.",
+    )
+    chunk_index = fields.Integer(
+        string="Chunk",
+        default=0,
+        help="Order of the job in its batch; -1 is a stored format download sent first.",
+    )
+    stored_format_id = fields.Many2one(
+        "natura.print.stored.format",
+        string="Stored Format",
+        readonly=True,
+        ondelete="set null",
+        help="Format download tracking updated when this job is sent.",
+    )
+    format_name = fields.Char(string="Format Name", readonly=True)
+    format_hash = fields.Char(string="Format Hash", readonly=True)
+    idempotency_key = fields.Char(
+        string="Idempotency Key",
+        readonly=True,
+        help="Identifies this chunk of its submission; a chunk whose key was already "
+        "sent within the idempotency window is skipped.",
+    )
+    state = fields.Selection(
+        [
+            ("queued", "Queued"),
+            ("done", "Done"),
+            ("skipped", "Skipped (Duplicate)"),
+            ("failed", "Failed"),
+            ("cancelled", "Cancelled"),
+        ],
+        string="Status",
+        default="queued",
+        required=True,
+        index=True,
+    )
+    attempt_count = fields.Integer(string="Attempts", default=0, readonly=True)
+    next_attempt_date = fields.Datetime(string="Next Attempt", readonly=True)
+    sent_date = fields.Datetime(string="Sent On", readonly=True)
+    send_seconds = fields.Float(
+        string="Send Time (s)",
+        readonly=True,
+        help="Time the printer (or relay) took to accept the payload.",
+    )
+    last_error = fields.Text(string="Last Error", readonly=True)
+
+    @api.model
+    def _trigger_processing(self):
+        self.env.ref("natura_print.ir_cron_natura_print_process_jobs")._trigger()
+
+    def action_retry(self):
+        self.filtered(lambda job: job.state in ("failed", "cancelled")).write(
+            {"state": "queued", "attempt_count": 0, "next_attempt_date": False}
+        )
+        # Retrying a skipped duplicate means printing it again on purpose.
+        self.filtered(lambda job: job.state == "skipped").write(
+            {"state": "queued", "attempt_count": 0, "idempotency_key": False}
+        )
+        self._trigger_processing()
+        return True
+
+    def action_cancel(self):
+        self.filtered(lambda job: job.state == "queued").write({"state": "cancelled"})
+        return True
+
+    def _mark_sent(self, durations=None):
+        now = fields.Datetime.now()
+        durations = durations or []
+        for index, job in enumerate(self):
+            job.write(
+                {
+                    "state": "done",
+                    "attempt_count": job.attempt_count + 1,
+                    "sent_date": now,
+                    "send_seconds": durations[index] if index < len(durations) else 0.0,
+                    "next_attempt_date": False,
+                    "last_error": False,
+                }
+            )
+            if job.stored_format_id:
+                job.stored_format_id.write(
+                    {
+                        "format_name": job.format_name,
+                        "format_hash": job.format_hash,
+                        "download_date": now,
+                    }
+                )
+
+    def _mark_failed(self, error):
+        self.ensure_one()
+        max_attempts = self.env["natura.print.service"]._get_config()["job_max_attempts"]
+        attempts = self.attempt_count + 1
+        exhausted = attempts >= max_attempts
+        self.write(
+            {
+                "state": "failed" if exhausted else "queued",
+                "attempt_count": attempts,
+                "last_error": str(error),
+                "next_attempt_date": False
+                if exhausted
+                else fields.Datetime.now() + timedelta(minutes=2 ** attempts),
+            }
+        )
+
+    @api.model
+    def _cron_process_jobs(self, limit=DEFAULT_JOB_BATCH_LIMIT):
+        """Drain due jobs, sending to different printers in parallel.
+
+        Jobs for one printer are sent in enqueue order. Once one of them
+        fails, the rest of that printer's jobs wait for a later run so
+        labels never print out of sequence. Each job is marked done and
+        committed as soon as it is sent, so a worker killed mid-run does
+        not print it again. Its idempotency key is recorded in that same
+        commit, so jobs left unsent are not mistaken for duplicates later.
+        """
+        now = fields.Datetime.now()
+        service = self.env["natura.print.service"]
+        blocked = set(
+            self.search([("state", "=", "queued"), ("next_attempt_date", ">", now)])
+            .mapped("printer_ip")
+        )
+        # Printers polled as down keep their jobs queued until they come back.
+        queued_ips = {
+            group["printer_ip"]
+            for group in self.read_group([("state", "=", "queued")], ["printer_ip"], ["printer_ip"])
+        }
+        blocked |= set(service._get_unavailable_printers(queued_ips - blocked))
+        jobs = self.search(
+            [
+                ("state", "=", "queued"),
+                ("printer_ip", "not in", list(blocked)),
+                "|",
+                ("next_attempt_date", "=", False),
+                ("next_attempt_date", "<=", now),
+            ],
+            order="id",
+            limit=limit,
+        )
+        keyed = jobs.filtered("idempotency_key")
+        sent_keys = service._get_sent_idempotency_keys(keyed.mapped("idempotency_key"))
+        duplicates = keyed.filtered(lambda job: job.idempotency_key in sent_keys)
+        duplicates.write({"state": "skipped", "next_attempt_date": False})
+        jobs_by_printer = {}
+        for job in jobs - duplicates:
+            jobs_by_printer.setdefault(job.printer_ip, self.browse())
+            jobs_by_printer[job.printer_ip] |= job
+
+        testing = getattr(threading.current_thread(), "testing", False)
+
+        def on_sent(ip, index, seconds):
+            job = jobs_by_printer[ip][index]
+            job._mark_sent([seconds])
+            if job.idempotency_key:
+                service._claim_idempotency_keys({job.idempotency_key: ip}, durable=False)
+            if not testing:
+                self.env.cr.commit()
+            service._record_send_latency(ip, [seconds])
+
+        try:
+            results = service._dispatch_parallel(
+                {
+                    ip: [(job.payload, job.idempotency_key) for job in printer_jobs]
+                    for ip, printer_jobs in jobs_by_printer.items()
+                },
+                on_sent=on_sent,
+            )
+        except UserError as exc:
+            # Relay not configured: keep the jobs queued and retry later.
+            for printer_jobs in jobs_by_printer.values():
+                printer_jobs[:1]._mark_failed(exc)
+            return True
+
+        for ip, printer_jobs in jobs_by_printer.items():
+            sent, error, _durations = results[ip]
+            if error and not isinstance(error, PrinterUnavailableError):
+                printer_jobs[sent]._mark_failed(error)
+        if not testing:
+            self.env.cr.commit()
+        if len(jobs) >= limit:
+            self._trigger_processing()
+        return True
+
+    @api.autovacuum
+    def _gc_finished_jobs(self):
+        limit_date = fields.Datetime.now() - timedelta(days=JOB_RETENTION_DAYS)
+        self.search(
+            [("state", "in", ("done", "skipped", "cancelled")), ("write_date", "<", limit_date)]
+        ).unlink()
+
@@ -0,0 +1,46 @@
+from odoo import _, api, fields, models
+from odoo.exceptions import ValidationError
+
+
+class NaturaPrintPrinterPool(models.Model):
+    _name = "natura.print.printer.pool"
+    _description = "Natura Print Printer Pool"
+    _order = "name"
+
+    name = fields.Char(string="Pool Name", required=True)
+    dpi = fields.Selection(
+        [('203', '8 dpmm (203 DPI)'), ('300', '12 dpmm (300 DPI)'), ('600', '24 dpmm (600 DPI)')],
+        string="DPI",
+        required=True,
+        help="All printers of the pool must print at this resolution.",
+    )
+    printer_ids = fields.Many2many(
+        "printers.list",
+        "natura_print_printer_pool_rel",
+        "pool_id",
+        "printer_id",
+        string="Printers",
+        domain="[('dpi', '=', dpi)]",
+    )
+    printer_count = fields.Integer(string="Printers", compute="_compute_printer_count")
+    note = fields.Text(string="Note")
+    active = fields.Boolean(default=True)
+
+    @api.depends("printer_ids")
+    def _compute_printer_count(self):
+        for pool in self:
+            pool.printer_count = len(pool.printer_ids)
+
+    @api.constrains("dpi", "printer_ids")
+    def _check_printer_dpi(self):
+        for pool in self:
+            mismatched = pool.printer_ids.filtered(lambda printer: printer.dpi != pool.dpi)
+            if mismatched:
+                raise ValidationError(
+                    _("Printers of pool %(pool)s must all be %(dpi)s DPI: %(printers)s")
+                    % {
+                        "pool": pool.display_name,
+                        "dpi": pool.dpi,
+                        "printers": ", ".join(mismatched.mapped("display_name")),
+                    }
+                )
@@ -1,4 +1,9 @@
-from odoo import fields, models
+from datetime import datetime, timedelta, timezone
+
+from odoo import api, fields, models
+
+# Print jobs of this many days are measured for a printer's throughput.
+THROUGHPUT_WINDOW_DAYS = 7
 
 class PrintersList(models.Model):
     _name = "printers.list"
@@ -13,9 +18,147 @@ class PrintersList(models.Model):
         help="Dots Per Inch - print resolution",
         required=True,
     )
+    transport = fields.Selection(
+        [('relay', 'HTTP Relay'), ('raw', 'Direct (Raw TCP)')],
+        string='Transport',
+        default='relay',
+        required=True,
+        help="HTTP Relay sends through the configured print relay. Direct streams "
+        "ZPL straight to the printer's raw port.",
+    )
+    raw_port = fields.Integer('Raw Port', default=9100)
+    status = fields.Selection(
+        [
+            ('unknown', 'Unknown'),
+            ('online', 'Online'),
+            ('paused', 'Paused'),
+            ('paper_out', 'Out of Media'),
+            ('ribbon_out', 'Out of Ribbon'),
+            ('head_open', 'Head Open'),
+            ('error', 'Error'),
+            ('offline', 'Offline'),
+        ],
+        string='Status',
+        default='unknown',
+        readonly=True,
+        help="Host status (~HS) from the last poll. Prints to a printer recently polled "
+        "as offline, open, out of media/ribbon or in error fail immediately.",
+    )
+    status_detail = fields.Char('Status Detail', readonly=True)
+    status_checked_on = fields.Datetime('Status Checked On', readonly=True)
+    last_seen = fields.Datetime('Last Seen', readonly=True, help="Last time the printer answered a poll.")
+    latency_ms = fields.Integer('Latency (ms)', readonly=True, help="Round trip of the last status poll.")
+    send_latency = fields.Float(
+        'Send Latency (s)',
+        digits=(16, 3),
+        readonly=True,
+        help="Smoothed time the printer (or relay) took to accept a payload, updated on "
+        "every send. Seeds the batch size of CSV print runs.",
+    )
+    throughput = fields.Float(
+        'Throughput (labels/s)',
+        compute='_compute_throughput',
+        digits=(16, 1),
+        help="Labels per second accepted over the print jobs of the last 7 days. Weights "
+        "this printer when a pool splits a job.",
+    )
+    pool_ids = fields.Many2many(
+        'natura.print.printer.pool',
+        'natura_print_printer_pool_rel',
+        'printer_id',
+        'pool_id',
+        string='Pools',
+    )
+    breaker_state = fields.Selection(
+        [('closed', 'Closed'), ('half_open', 'Probing'), ('open', 'Open')],
+        string='Circuit Breaker',
+        compute='_compute_breaker_state',
+        help="Open means sends to this printer fail fast after repeated failures, until a "
+        "probe succeeds. State is tracked per server worker.",
+    )
+    breaker_failures = fields.Integer('Consecutive Failures', compute='_compute_breaker_state')
+    breaker_opened_on = fields.Datetime('Breaker Opened On', compute='_compute_breaker_state')
+    breaker_last_error = fields.Char('Last Send Error', compute='_compute_breaker_state')
     note = fields.Text('Note', translate=True)
     active = fields.Boolean(
         'Active',
         default=True,
         help="If unchecked, it will allow you to hide the printer without removing it.",
-    )
\ No newline at end of file
+    )
+
+    def _compute_throughput(self):
+        since = fields.Datetime.now() - timedelta(days=THROUGHPUT_WINDOW_DAYS)
+        groups = self.env["natura.print.job"].sudo().read_group(
+            [
+                ("printer_ip", "in", self.mapped("ip_address")),
+                ("state", "=", "done"),
+                ("send_seconds", ">", 0),
+                ("create_date", ">=", since),
+            ],
+            ["label_count:sum", "send_seconds:sum"],
+            ["printer_ip"],
+        )
+        rates = {
+            group["printer_ip"]: group["label_count"] / group["send_seconds"]
+            for group in groups
+            if group["send_seconds"]
+        }
+        for printer in self:
+            printer.throughput = rates.get(printer.ip_address, 0.0)
+
+    def _compute_breaker_state(self):
+        service = self.env["natura.print.service"]
+        for printer in self:
+            status = service._get_breaker_status(printer.ip_address)
+            printer.breaker_state = status["state"]
+            printer.breaker_failures = status["failures"]
+            printer.breaker_opened_on = (
+                datetime.fromtimestamp(status["opened_on"], timezone.utc).replace(tzinfo=None)
+                if status["opened_on"]
+                else False
+            )
+            printer.breaker_last_error = status["last_error"] or False
+
+    @api.constrains("dpi")
+    def _check_pool_dpi(self):
+        self.pool_ids._check_printer_dpi()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        printers = super().create(vals_list)
+        # Transports are cached per IP in natura.print.service.
+        self.env.registry.clear_cache()
+        return printers
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {"ip_address", "transport", "raw_port", "active"} & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    def action_reset_stored_formats(self):
+        """Forget downloaded stored formats so they are sent again on next print."""
+        self.env["natura.print.stored.format"].sudo().search(
+            [("printer_ip", "in", self.mapped("ip_address"))]
+        ).unlink()
+        return True
+
+    def action_poll_status(self):
+        self.env["natura.print.service"]._poll_printers(self)
+        return True
+
+    @api.model
+    def _cron_poll_status(self):
+        self.env["natura.print.service"]._poll_printers(self.search([]))
+        return True
+
+    def action_reset_breaker(self):
+        service = self.env["natura.print.service"]
+        for printer in self:
+            service._reset_breakers(printer.ip_address)
+        return True
@@ -1,5 +1,7 @@
 from odoo import fields, models
 
+from .natura_print_service import PREVIEW_BACKENDS
+
 
 class ResConfigSettings(models.TransientModel):
     _inherit = "res.config.settings"
@@ -16,3 +18,152 @@ class ResConfigSettings(models.TransientModel):
         string="API Password",
         config_parameter="natura_print.api_password",
     )
+    natura_print_pool_size = fields.Integer(
+        string="Connection Pool Size",
+        config_parameter="natura_print.pool_size",
+        default=10,
+        help="Keep-alive connections each worker keeps open to the print relay.",
+    )
+    natura_print_connect_timeout = fields.Float(
+        string="Connect Timeout (s)",
+        config_parameter="natura_print.connect_timeout",
+        default=5.0,
+    )
+    natura_print_read_timeout = fields.Float(
+        string="Read Timeout (s)",
+        config_parameter="natura_print.read_timeout",
+        default=10.0,
+    )
+    natura_print_chunk_max_bytes = fields.Integer(
+        string="Max Payload Size (bytes)",
+        config_parameter="natura_print.chunk_max_bytes",
+        default=262144,
+        help="Labels are concatenated into one relay request up to this size.",
+    )
+    natura_print_chunk_max_labels = fields.Integer(
+        string="Max Labels per Request",
+        config_parameter="natura_print.chunk_max_labels",
+        default=100,
+    )
+    natura_print_adaptive_target_bytes = fields.Integer(
+        string="Initial Batch Size (bytes)",
+        config_parameter="natura_print.adaptive_target_bytes",
+        default=65536,
+        help="Starting payload size for CSV runs; adjusted to the measured send latency.",
+    )
+    natura_print_adaptive_target_latency = fields.Float(
+        string="Target Send Latency (s)",
+        config_parameter="natura_print.adaptive_target_latency",
+        default=1.0,
+        help="CSV batches grow while sends are faster than this and shrink when slower.",
+    )
+    natura_print_direct_print = fields.Boolean(
+        string="Print Directly",
+        config_parameter="natura_print.direct_print",
+        help="Send wizard prints during the request instead of queueing them as print jobs.",
+    )
+    natura_print_job_max_attempts = fields.Integer(
+        string="Print Job Attempts",
+        config_parameter="natura_print.job_max_attempts",
+        default=5,
+        help="Attempts before a queued print job is marked as failed.",
+    )
+    natura_print_max_parallel_printers = fields.Integer(
+        string="Parallel Printers",
+        config_parameter="natura_print.max_parallel_printers",
+        default=8,
+        help="Printers served concurrently when a job targets several printers.",
+    )
+    natura_print_raw_connect_timeout = fields.Float(
+        string="Direct Connect Timeout (s)",
+        config_parameter="natura_print.raw_connect_timeout",
+        default=3.0,
+    )
+    natura_print_raw_write_timeout = fields.Float(
+        string="Direct Write Timeout (s)",
+        config_parameter="natura_print.raw_write_timeout",
+        default=10.0,
+    )
+    natura_print_send_retries = fields.Integer(
+        string="Send Retries",
+        config_parameter="natura_print.send_retries",
+        default=2,
+        help="Retries of a failed send (network error, timeout, 429 or 5xx).",
+    )
+    natura_print_retry_backoff = fields.Float(
+        string="Retry Backoff (s)",
+        config_parameter="natura_print.retry_backoff",
+        default=0.5,
+        help="Base delay, doubled on each retry with random jitter.",
+    )
+    natura_print_breaker_threshold = fields.Integer(
+        string="Circuit Breaker Threshold",
+        config_parameter="natura_print.breaker_threshold",
+        default=3,
+        help="Consecutive failures after which sends to a printer fail fast.",
+    )
+    natura_print_breaker_cooldown = fields.Float(
+        string="Circuit Breaker Cooldown (s)",
+        config_parameter="natura_print.breaker_cooldown",
+        default=60.0,
+        help="Wait before a probe send is allowed to an unavailable printer.",
+    )
+    natura_print_idempotency_window = fields.Integer(
+        string="Duplicate Window (s)",
+        config_parameter="natura_print.idempotency_window",
+        default=600,
+        help="A submission repeated within this time (double click, retry after a timeout) "
+        "is not printed again. 0 disables it.",
+    )
+    natura_print_status_timeout = fields.Float(
+        string="Status Poll Timeout (s)",
+        config_parameter="natura_print.status_timeout",
+        default=3.0,
+    )
+    natura_print_status_max_age = fields.Integer(
+        string="Trust Status For (s)",
+        config_parameter="natura_print.status_max_age",
+        default=300,
+        help="How long a polled 'down' status makes prints fail fast. 0 disables it.",
+    )
+    natura_print_status_poll_workers = fields.Integer(
+        string="Parallel Status Polls",
+        config_parameter="natura_print.status_poll_workers",
+        default=32,
+    )
+    natura_print_preview_backend = fields.Selection(
+        PREVIEW_BACKENDS,
+        string="Preview Backend",
+        config_parameter="natura_print.preview_backend",
+        default="local",
+        help="Built-in renders label previews on the server without internet access.",
+    )
+    natura_print_labelary_url = fields.Char(
+        string="Labelary URL",
+        config_parameter="natura_print.labelary_url",
+        default="https://api.labelary.com/v1",
+        help="Base URL of the Labelary API, or of a compatible local service.",
+    )
+    natura_print_labelary_rate = fields.Float(
+        string="Labelary Requests per Second",
+        config_parameter="natura_print.labelary_rate",
+        default=3.0,
+        help="Shared by all users of each server worker; Labelary answers faster "
+        "bursts with errors.",
+    )
+    natura_print_preview_cache_days = fields.Integer(
+        string="Keep Previews (days)",
+        config_parameter="natura_print.preview_cache_days",
+        default=30,
+    )
+    natura_print_preview_cache_max_bytes = fields.Integer(
+        string="Preview Cache Size (bytes)",
+        config_parameter="natura_print.preview_cache_max_bytes",
+        default=268435456,
+        help="Oldest cached previews are removed beyond this total size.",
+    )
+
+    def set_values(self):
+        super().set_values()
+        # natura.print.service caches its parsed configuration per registry.
+        self.env.registry.clear_cache()
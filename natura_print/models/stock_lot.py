@@ -71,11 +71,10 @@ class StockLot(models.Model):
                 )
             )
 
-        for record in self:
-            service.print_record(
-                record,
-                template=template,
-                printer_ip=printer_ip_value,
-                qty=qty or 1,
-                overrides=overrides,
-            )
+        service.print_records(
+            self,
+            template=template,
+            printer_ip=printer_ip_value,
+            qty=qty or 1,
+            overrides=overrides,
+        )
@@ -0,0 +1,53 @@
+from odoo import api, fields, models
+
+
+class NaturaPrintStoredFormat(models.Model):
+    _name = "natura.print.stored.format"
+    _description = "Natura Print Stored Format"
+    _order = "id"
+
+    template_id = fields.Many2one(
+        "zpl.label.template",
+        string="Label Template",
+        required=True,
+        ondelete="cascade",
+    )
+    printer_ip = fields.Char(string="Printer IP", required=True, index=True)
+    format_name = fields.Char(string="Format Name", required=True)
+    format_hash = fields.Char(string="Format Hash", required=True)
+    download_date = fields.Datetime(string="Downloaded On")
+
+    _sql_constraints = [
+        (
+            "natura_print_stored_format_unique",
+            "unique(template_id, printer_ip)",
+            "A template can only be tracked once per printer.",
+        ),
+    ]
+
+    @api.model
+    def _lock_tracking(self, template_id, printer_ip):
+        """Return the tracking row of ``template_id`` on ``printer_ip``, locked.
+
+        The row is created empty when missing. Concurrent first prints of a
+        template to one printer wait here for each other, so only one of
+        them downloads the format and records it.
+        """
+        now = fields.Datetime.now()
+        self.env.cr.execute(
+            f"""
+            INSERT INTO {self._table}
+                (template_id, printer_ip, format_name, format_hash,
+                 create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, '', '', %s, %s, %s, %s)
+            ON CONFLICT (template_id, printer_ip) DO NOTHING
+            """,
+            [template_id, printer_ip, self.env.uid, now, self.env.uid, now],
+        )
+        self.env.cr.execute(
+            f"SELECT id FROM {self._table} WHERE template_id = %s AND printer_ip = %s FOR UPDATE",
+            [template_id, printer_ip],
+        )
+        tracking = self.browse(self.env.cr.fetchone()[0])
+        tracking.invalidate_recordset()
+        return tracking
@@ -1,12 +1,79 @@
 import base64
+import hashlib
 import re
+from collections import namedtuple
+from functools import partial
 
-import requests
+from odoo import api, fields, models, tools
+from odoo.tools import frozendict
 
-from odoo import api, fields, models
-from odoo.exceptions import UserError
+from .natura_print_service import PREVIEW_BACKENDS
 
 PLACEHOLDER_RE = re.compile(r"\$\{([^}]+)\}")
+FIELD_DATA_RE = re.compile(r"(\^FH[^^~]?)?\^FD(.*?)(?=\^FS)", re.DOTALL)
+# Changing any of these makes the stored preview stale.
+PREVIEW_FIELDS = {"zpl_code", "dpi", "width", "height"}
+DEFAULT_PREVIEW_BATCH_LIMIT = 100
+
+StoredFormat = namedtuple("StoredFormat", ["name", "zpl", "hash", "slots"])
+
+
+def _compile_zpl(zpl_code):
+    """Split ZPL into literal chunks and placeholder names.
+
+    Returns ``(literals, names)`` where ``literals`` always holds one more
+    item than ``names``; rendering interleaves the two in a single pass.
+    """
+    parts = PLACEHOLDER_RE.split(zpl_code or "")
+    return tuple(parts[0::2]), tuple(parts[1::2])
+
+
+def _render_compiled(compiled, values, keep_missing=False):
+    literals, names = compiled
+    chunks = [literals[0]]
+    for name, literal in zip(names, literals[1:]):
+        if name in values:
+            value = values[name]
+            chunks.append("" if value is None else str(value))
+        elif keep_missing:
+            chunks.append(f"${{{name}}}")
+        chunks.append(literal)
+    return "".join(chunks)
+
+
+def _compile_stored_format(zpl_code):
+    """Turn a single-label template into a ^DF format body and its ^FN slots.
+
+    Every ^FD block holding a placeholder becomes ``^FN<n>``; a ^FH directly
+    in front of it moves to the recall. Returns ``(body, slots)`` with
+    ``slots`` as ``(number, hex_prefix, compiled_data)`` tuples, or ``None``
+    when the ZPL holds several labels or a placeholder outside ^FD data.
+    """
+    code = (zpl_code or "").strip()
+    upper = code.upper()
+    if (
+        not upper.startswith("^XA")
+        or not upper.endswith("^XZ")
+        or upper.count("^XA") != 1
+        or upper.count("^XZ") != 1
+    ):
+        return None
+
+    slots = []
+
+    def _replace(match):
+        data = match.group(2)
+        if not PLACEHOLDER_RE.search(data):
+            return match.group(0)
+        number = len(slots) + 1
+        slots.append((number, match.group(1) or "", _compile_zpl(data)))
+        return f"^FN{number}"
+
+    body = FIELD_DATA_RE.sub(_replace, code[3:-3])
+    if PLACEHOLDER_RE.search(body):
+        return None
+    return body, tuple(slots)
+
 
 class LabelTemplate(models.Model):
     _name = "zpl.label.template"
@@ -43,13 +110,73 @@ class LabelTemplate(models.Model):
         default=True,
         help="If unchecked, it will allow you to hide the template without removing it.",
     )
-    preview_image = fields.Binary(string="Preview", attachment=False)
+    stored_format = fields.Boolean(
+        string="Stored Format Printing",
+        help="Download the template to each printer once (^DF) and send only the "
+        "placeholder values (^XF) for every label.",
+    )
+    stored_format_error = fields.Char(
+        string="Stored Format Error",
+        compute="_compute_stored_format_error",
+    )
+    preview_image = fields.Image(string="Preview")
+    preview_image_256 = fields.Image(
+        string="Preview Thumbnail",
+        related="preview_image",
+        max_width=256,
+        max_height=256,
+        store=True,
+    )
     preview_error = fields.Char(string="Preview Error", readonly=True)
+    preview_state = fields.Selection(
+        [("pending", "Pending"), ("done", "Up to Date"), ("error", "Failed")],
+        string="Preview Status",
+        default="pending",
+        readonly=True,
+        copy=False,
+        help="Previews are rendered in the background after a template is created or "
+        "its code, DPI or size change.",
+    )
+    preview_backend = fields.Selection(
+        PREVIEW_BACKENDS,
+        string="Preview Backend",
+        compute="_compute_preview_backend",
+    )
     placeholder_ids = fields.One2many(
         "natura.print.placeholder",
         "template_id",
         string="Placeholders",
     )
+    placeholder_error = fields.Text(
+        string="Placeholder Errors",
+        compute="_compute_placeholder_error",
+    )
+
+    @api.depends("placeholder_ids.field_path_error")
+    def _compute_placeholder_error(self):
+        for template in self:
+            errors = [
+                f"${{{ph.placeholder}}}: {ph.field_path_error}"
+                for ph in template.placeholder_ids
+                if ph.field_path_error
+            ]
+            template.placeholder_error = "\n".join(errors) or False
+
+    def _compute_preview_backend(self):
+        backend = self.env["natura.print.service"]._get_config()["preview_backend"]
+        for template in self:
+            template.preview_backend = backend
+
+    @api.depends("stored_format", "zpl_code")
+    def _compute_stored_format_error(self):
+        for template in self:
+            if template.stored_format and _compile_stored_format(template.zpl_code) is None:
+                template.stored_format_error = (
+                    "Stored format needs a single ^XA...^XZ label with placeholders only "
+                    "inside ^FD field data. Labels will be sent in full."
+                )
+            else:
+                template.stored_format_error = False
 
     def _extract_placeholders(self, zpl_code):
         return sorted(set(PLACEHOLDER_RE.findall(zpl_code or "")))
@@ -83,73 +210,154 @@ class LabelTemplate(models.Model):
                 elif not record.model_id:
                     record.model_id = template.model_id.id
 
+    @api.model
+    @tools.ormcache("template_id", "write_date")
+    def _get_compiled_zpl_cached(self, template_id, write_date):
+        return _compile_zpl(self.browse(template_id).zpl_code)
+
+    def _get_compiled_zpl(self):
+        self.ensure_one()
+        if not isinstance(self.id, int):
+            # Unsaved (onchange) records have no stable cache key.
+            return _compile_zpl(self.zpl_code)
+        return self._get_compiled_zpl_cached(self.id, self.write_date)
+
     def _render_zpl(self, record):
         self.ensure_one()
-        zpl = self.zpl_code or ""
-        mapping = {}
-        for ph in self.placeholder_ids:
-            key = ph.placeholder
-            if key and key.startswith("${") and key.endswith("}"):
-                key = key[2:-1].strip()
-            mapping[key] = ph
-
-        for placeholder in self._extract_placeholders(zpl):
-            value = ""
-            ph = mapping.get(placeholder)
-            if ph:
-                field_path = (ph.field_path or "").strip()
-                if not field_path and ph.field_id:
-                    field_path = ph.field_id.name
-                if field_path:
-                    value = self._resolve_field_path(record, field_path)
-            zpl = zpl.replace(f"${{{placeholder}}}", value)
-        return zpl
+        return _render_compiled(self._get_compiled_zpl(), self._values_from_record(record))
 
     def _render_zpl_from_values(self, values):
         self.ensure_one()
-        zpl = self.zpl_code or ""
-        for placeholder in self._extract_placeholders(zpl):
-            if placeholder not in values:
-                continue
-            value = values.get(placeholder)
-            value = "" if value is None else str(value)
-            zpl = zpl.replace(f"${{{placeholder}}}", value)
-        return zpl
+        return _render_compiled(self._get_compiled_zpl(), values, keep_missing=True)
 
-    def _values_from_record(self, record):
+    @api.model
+    @tools.ormcache("template_id", "write_date")
+    def _get_stored_format_cached(self, template_id, write_date):
+        compiled = _compile_stored_format(self.browse(template_id).zpl_code)
+        if compiled is None:
+            return None
+        body, slots = compiled
+        digest = hashlib.sha1(body.encode("utf-8")).hexdigest()
+        # Per template and content: a duplicated template with the same body
+        # must not share (and later delete) the other's format. Object names
+        # are limited to 16 characters.
+        name = f"E:NP{template_id}T{digest[:7].upper()}.ZPL"
+        return StoredFormat(name, f"^XA^DF{name}^FS{body}^XZ", digest, slots)
+
+    def _get_stored_format(self):
+        """Return the template's ``StoredFormat``, or ``None`` when not in use."""
+        self.ensure_one()
+        if not self.stored_format or not isinstance(self.id, int):
+            return None
+        return self._get_stored_format_cached(self.id, self.write_date)
+
+    @staticmethod
+    def _render_stored_recall(stored, values):
+        field_data = "".join(
+            f"^FN{number}{prefix}^FD{_render_compiled(data, values, keep_missing=True)}^FS"
+            for number, prefix, data in stored.slots
+        )
+        return f"^XA^XF{stored.name}^FS{field_data}^XZ"
+
+    @api.model
+    @tools.ormcache("template_id")
+    def _get_placeholder_paths_cached(self, template_id):
+        return frozendict(self.browse(template_id).sudo()._build_placeholder_paths())
+
+    def _get_placeholder_paths(self):
+        """Return ``{placeholder: field_path}`` for every placeholder in the ZPL.
+
+        The mapping is cached per template and invalidated whenever the ZPL
+        code, a placeholder or a placeholder path line changes.
+        """
+        self.ensure_one()
+        if not isinstance(self.id, int):
+            return self._build_placeholder_paths()
+        return self._get_placeholder_paths_cached(self.id)
+
+    def _build_placeholder_paths(self):
         self.ensure_one()
-        zpl = self.zpl_code or ""
-        mapping = {}
         placeholder_map = {}
         for ph in self.placeholder_ids:
             key = ph.placeholder
             if key and key.startswith("${") and key.endswith("}"):
                 key = key[2:-1].strip()
-            placeholder_map[key] = ph
-
-        for placeholder in self._extract_placeholders(zpl):
-            value = ""
-            ph = placeholder_map.get(placeholder)
-            if ph:
-                field_path = (ph.field_path or "").strip()
-                if not field_path and ph.field_id:
-                    field_path = ph.field_id.name
-                if field_path:
-                    value = self._resolve_field_path(record, field_path)
-            mapping[placeholder] = value
-        return mapping
+            field_path = (ph.field_path or "").strip()
+            if not field_path and ph.field_id:
+                field_path = ph.field_id.name
+            placeholder_map[key] = field_path
+        return {
+            placeholder: placeholder_map.get(placeholder, "")
+            for placeholder in set(self._get_compiled_zpl()[1])
+        }
+
+    def _values_from_record(self, record):
+        self.ensure_one()
+        return {
+            placeholder: self._resolve_field_path(record, field_path) if field_path else ""
+            for placeholder, field_path in self._get_placeholder_paths().items()
+        }
+
+    def _values_many(self, records):
+        self.ensure_one()
+        field_paths = set(filter(None, self._get_placeholder_paths().values()))
+        for field_path in field_paths:
+            self._prefetch_field_path(records, field_path)
+        return [self._values_from_record(record) for record in records]
+
+    def render_many(self, records, render=None, overrides=None):
+        """Render one ZPL string per record in ``records``, in iteration order.
+
+        Field paths are loaded for the whole recordset hop by hop before the
+        per-record walk, so the query count does not grow with the batch size.
+        ``render`` turns placeholder values into ZPL (the full template by
+        default, see ``natura.print.service._get_label_renderer``);
+        ``overrides`` replace placeholder values for every record.
+        """
+        self.ensure_one()
+        if render is None:
+            render = partial(_render_compiled, self._get_compiled_zpl())
+        labels = []
+        for values in self._values_many(records):
+            if overrides:
+                values.update(overrides)
+            labels.append(render(values))
+        return labels
 
     @staticmethod
-    def _resolve_field_path(record, field_path):
-        value = record
-        try:
-            for part in field_path.split("."):
-                if not value:
-                    return ""
-                value = value[part]
-        except Exception:
+    def _prefetch_field_path(records, field_path):
+        current = records
+        for part in field_path.split("."):
+            if not current or part not in current._fields:
+                return
+            if not current._fields[part].relational:
+                current.mapped(part)
+                return
+            current = current.mapped(part)
+        if current:
+            current.mapped("display_name")
+
+    def _resolve_field_path(self, record, field_path):
+        if not record:
+            return ""
+        hops, error = self.env["natura.print.placeholder"]._compile_field_path(
+            record._name, field_path
+        )
+        if error:
             return ""
 
+        value = record
+        for name, relational in hops:
+            if not value:
+                return ""
+            if relational:
+                value = value.mapped(name)
+            elif len(value) > 1:
+                items = value.mapped(name)
+                return ", ".join(str(item) for item in items if item not in (False, None))
+            else:
+                value = value[name]
+
         if isinstance(value, models.BaseModel):
             return ", ".join(value.mapped("display_name")) if value else ""
         return "" if value in (False, None) else str(value)
@@ -172,58 +380,70 @@ class LabelTemplate(models.Model):
     def create(self, vals_list):
         records = super().create(vals_list)
         records._sync_placeholders()
-        for record in records:
-            record._update_preview_image(silent=True)
+        records._trigger_preview_rendering()
         return records
 
     def write(self, vals):
+        preview_changed = bool(PREVIEW_FIELDS & set(vals))
+        if preview_changed:
+            vals = dict(vals, preview_state="pending")
         res = super().write(vals)
         if "zpl_code" in vals:
+            # write_date does not move within a transaction; drop the compiled
+            # template and placeholder mapping caches explicitly.
+            self.env.registry.clear_cache()
             self._sync_placeholders()
-        if {"zpl_code", "dpi", "width", "height"} & set(vals):
-            for record in self:
-                record._update_preview_image(silent=True)
+        if preview_changed:
+            self._trigger_preview_rendering()
         return res
 
+    @api.model
+    def _trigger_preview_rendering(self):
+        self.env.ref("natura_print.ir_cron_natura_print_render_previews")._trigger()
 
-    def _labelary_dpmm(self):
-        mapping = {
-            "203": "8",
-            "300": "12",
-            "600": "24",
-        }
-        return mapping.get(self.dpi)
+    @api.model
+    def _cron_render_previews(self, limit=DEFAULT_PREVIEW_BATCH_LIMIT):
+        """Render the previews of templates created or changed since the last run."""
+        templates = self.with_context(active_test=False).search(
+            [("preview_state", "=", "pending")], order="id", limit=limit
+        )
+        templates._update_preview_image(silent=True)
+        if len(templates) >= limit:
+            self._trigger_preview_rendering()
+        return True
 
-    def _update_preview_image(self, silent=False):
+    def _get_preview_attachment(self, zpl, cached_only=False):
+        """Return the shared preview cache attachment of ``zpl`` at this template's size and DPI.
+
+        Returns a ``UserError`` if rendering fails, and None with
+        ``cached_only`` when the preview is not cached yet.
+        """
         self.ensure_one()
-        self.preview_error = False
-        if not self.zpl_code or not self.width or not self.height or not self.dpi:
-            self.preview_image = False
-            return
-
-        dpmm = self._labelary_dpmm()
-        if not dpmm:
-            self.preview_image = False
-            self.preview_error = "Unsupported DPI for Labelary preview."
-            if not silent:
-                raise UserError(self.preview_error)
-            return
-
-        url = (
-            f"https://api.labelary.com/v1/printers/{dpmm}dpmm/"
-            f"labels/{self.width}x{self.height}/0/"
+        return self.env["natura.print.service"]._get_preview_attachments(
+            [(zpl, self.dpi, self.width, self.height)], cached_only=cached_only
+        )[0]
+
+    def _update_preview_image(self, silent=False):
+        """Render the previews of these templates, several at a time."""
+        todo = self.filtered(
+            lambda template: template.zpl_code and template.width and template.height and template.dpi
         )
-        try:
-            response = requests.post(
-                url,
-                data=self.zpl_code.encode("utf-8"),
-                headers={"Accept": "image/png"},
-                timeout=10,
-            )
-            response.raise_for_status()
-            self.preview_image = base64.b64encode(response.content)
-        except requests.RequestException as exc:
-            self.preview_image = False
-            self.preview_error = f"Preview failed: {exc}"
-            if not silent:
-                raise UserError(self.preview_error)
+        (self - todo).write({"preview_image": False, "preview_error": False, "preview_state": "done"})
+        results = self.env["natura.print.service"]._render_previews(
+            [(template.zpl_code, template.dpi, template.width, template.height) for template in todo]
+        )
+        for template, result in zip(todo, results):
+            if isinstance(result, Exception):
+                template.write(
+                    {"preview_image": False, "preview_error": str(result), "preview_state": "error"}
+                )
+                if not silent:
+                    raise result
+            else:
+                template.write(
+                    {
+                        "preview_image": base64.b64encode(result),
+                        "preview_error": False,
+                        "preview_state": "done",
+                    }
+                )
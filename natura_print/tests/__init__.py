@@ -0,0 +1,3 @@
+from . import test_raw_transport
+from . import test_render_many
+from . import test_zpl_rasterizer
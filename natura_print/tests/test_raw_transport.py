@@ -0,0 +1,120 @@
+import socket
+import socketserver
+import threading
+import time
+from unittest.mock import patch
+
+from odoo.tests.common import BaseCase, tagged
+
+from ..models import natura_print_service as service
+
+
+HOST_STATUS_REPLY = (
+    b"\x02030,0,0,1245,000,0,0,0,000,0,0,0\x03\r\n"
+    b"\x02000,0,0,0,0,2,4,0,00000000,1,000\x03\r\n"
+    b"\x021234,0\x03\r\n"
+)
+
+
+class _RecordingHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data = b""
+        while True:
+            received = self.request.recv(65536)
+            if not received:
+                break
+            data += received
+            if data.endswith(service.HOST_STATUS_QUERY.encode("ascii")):
+                self.request.sendall(HOST_STATUS_REPLY)
+        self.server.received.append(data)
+
+
+@tagged("post_install", "-at_install")
+class TestRawTransport(BaseCase):
+    """Raw (port 9100) sends against a local listener standing in for a printer."""
+
+    def setUp(self):
+        super().setUp()
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RecordingHandler)
+        self.server.received = []
+        self.host, self.port = self.server.server_address
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self._stop_server)
+
+    def _stop_server(self):
+        self._close_idle()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _close_idle(self):
+        with service._socket_lock:
+            idle = service._idle_sockets.pop((self.host, self.port), [])
+        for sock, _released_at in idle:
+            sock.close()
+
+    def _send(self, data):
+        service._raw_send(self.host, self.port, data, 1.0, 1.0)
+
+    def _received(self, connections):
+        """Close the pooled sockets and return the bytes received per connection."""
+        self._close_idle()
+        deadline = time.monotonic() + 5
+        while len(self.server.received) < connections and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.server.received
+
+    def test_payloads_arrive_on_one_reused_socket(self):
+        self._send(b"^XA^FDfirst^FS^XZ")
+        self._send(b"^XA^FDsecond^FS^XZ")
+        self.assertEqual(len(service._idle_sockets[(self.host, self.port)]), 1)
+        self.assertEqual(self._received(1), [b"^XA^FDfirst^FS^XZ^XA^FDsecond^FS^XZ"])
+
+    def test_large_payload_is_intact(self):
+        payload = b"^XA^GFA,1,1,1," + b"F0" * 200000 + b"^XZ"
+        self._send(payload)
+        self.assertEqual(self._received(1), [payload])
+
+    def test_socket_closed_by_printer_is_replaced(self):
+        self._send(b"first")
+        idle_sock, _released_at = service._idle_sockets[(self.host, self.port)][0]
+        # The printer drops the idle connection: the pooled socket sees EOF.
+        idle_sock.shutdown(socket.SHUT_WR)
+        time.sleep(0.2)
+        self._send(b"second")
+        self.assertEqual(self._received(2), [b"first", b"second"])
+
+    def test_stale_socket_is_retried_on_a_new_connection(self):
+        first, peer = socket.socketpair()
+        peer.close()
+        first.shutdown(socket.SHUT_WR)
+        service._checkin_socket(self.host, self.port, first)
+        # The liveness check can miss a connection that breaks on write.
+        with patch.object(service, "_socket_is_alive", return_value=True):
+            self._send(b"payload")
+        self.assertEqual(self._received(1), [b"payload"])
+
+    def test_expired_idle_socket_is_not_reused(self):
+        self._send(b"first")
+        key = (self.host, self.port)
+        sock, released_at = service._idle_sockets[key][0]
+        service._idle_sockets[key][0] = (sock, released_at - service.RAW_SOCKET_IDLE_SECONDS - 1)
+        self._send(b"second")
+        self.assertEqual(self._received(2), [b"first", b"second"])
+
+    def test_status_query_reuses_the_print_socket(self):
+        self._send(b"label")
+        reply = service._raw_query(self.host, self.port, b"~HS", 1.0)
+        self.assertEqual(service._parse_host_status(reply), ("online", ""))
+        # A second connection would wait on a printer that accepts only one.
+        self.assertEqual(self._received(1), [b"label~HS"])
+
+    def test_idle_socket_is_closed_after_expiry(self):
+        with patch.object(service, "RAW_SOCKET_IDLE_SECONDS", 0.2):
+            self._send(b"label")
+            deadline = time.monotonic() + 5
+            while not self.server.received and time.monotonic() < deadline:
+                time.sleep(0.05)
+        # Closed by the reaper without another checkout from this worker.
+        self.assertEqual(self.server.received, [b"label"])
+        self.assertNotIn((self.host, self.port), service._idle_sockets)
@@ -0,0 +1,75 @@
+from odoo.tests.common import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestRenderMany(TransactionCase):
+    """render_many() loads field paths per recordset, not per record."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.template = cls.env["zpl.label.template"].create(
+            {
+                "name": "Lot Category",
+                "model_id": cls.env.ref("stock.model_stock_lot").id,
+                "dpi": "203",
+                "width": 2.0,
+                "height": 1.0,
+                "zpl_code": "^XA^FO20,20^FD${lot}|${category}^FS^XZ",
+            }
+        )
+        fields_model = cls.env["ir.model.fields"]
+        paths = {
+            "lot": [fields_model._get("stock.lot", "name")],
+            "category": [
+                fields_model._get("stock.lot", "product_id"),
+                fields_model._get("product.product", "categ_id"),
+                fields_model._get("product.category", "name"),
+            ],
+        }
+        for placeholder in cls.template.placeholder_ids:
+            placeholder.path_line_ids = [
+                (0, 0, {"sequence": sequence, "field_id": field.id})
+                for sequence, field in enumerate(paths[placeholder.placeholder])
+            ]
+        cls.lots = cls.env["stock.lot"]
+        for index in range(10):
+            category = cls.env["product.category"].create({"name": f"Category {index}"})
+            product = cls.env["product.product"].create(
+                {
+                    "name": f"Product {index}",
+                    "type": "product",
+                    "tracking": "lot",
+                    "categ_id": category.id,
+                }
+            )
+            cls.lots |= cls.env["stock.lot"].create(
+                {
+                    "name": f"LOT{index}",
+                    "product_id": product.id,
+                    "company_id": cls.env.company.id,
+                }
+            )
+
+    def _render(self, lots):
+        self.env.invalidate_all()
+        return self.template.render_many(lots)
+
+    def test_render_values(self):
+        labels = self._render(self.lots[:2])
+        self.assertEqual(
+            labels,
+            [
+                "^XA^FO20,20^FDLOT0|Category 0^FS^XZ",
+                "^XA^FO20,20^FDLOT1|Category 1^FS^XZ",
+            ],
+        )
+
+    def test_query_count_does_not_grow_with_batch(self):
+        # Warm the compiled template and field path caches.
+        self._render(self.lots[:1])
+        queries = self.env.cr.sql_log_count
+        self._render(self.lots[:1])
+        single = self.env.cr.sql_log_count - queries
+        with self.assertQueryCount(single):
+            self._render(self.lots)
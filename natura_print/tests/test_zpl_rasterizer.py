@@ -0,0 +1,106 @@
+import base64
+import io
+import zlib
+
+from PIL import Image
+
+from odoo.tests.common import BaseCase, tagged
+
+from ..tools import zpl_rasterizer
+from ..tools.zpl_rasterizer import ZplRenderError
+
+
+@tagged("post_install", "-at_install")
+class TestZplRasterizer(BaseCase):
+    def _render(self, zpl, width=1.0, height=1.0):
+        png = zpl_rasterizer.render_png(zpl, 203, width, height)
+        return Image.open(io.BytesIO(png)).convert("L")
+
+    # Code 128
+
+    def test_code128_subset_b_checksum(self):
+        # Start B, "PJJ123C" as value - 32, then (104 + sum(position * value)) % 103.
+        self.assertEqual(
+            zpl_rasterizer._code128_values("PJJ123C"), [104, 48, 42, 42, 17, 18, 19, 35, 55]
+        )
+
+    def test_code128_subset_c_for_digits(self):
+        # (105 + 1*12 + 2*34 + 3*56) % 103 == 44
+        self.assertEqual(zpl_rasterizer._code128_values("123456"), [105, 12, 34, 56, 44])
+
+    def test_code128_switches_to_subset_c(self):
+        self.assertEqual(
+            zpl_rasterizer._code128_values("AB123456"), [104, 33, 34, 99, 12, 34, 56, 26]
+        )
+
+    def test_code128_ignores_invocation_codes(self):
+        self.assertEqual(
+            zpl_rasterizer._code128_values(">;123456"), zpl_rasterizer._code128_values("123456")
+        )
+
+    def test_code128_modules(self):
+        modules = zpl_rasterizer._code128_modules("123456")
+        # 11 modules per symbol, 13 for the stop pattern; bars first and last.
+        self.assertEqual(len(modules), 11 * 5 + 13)
+        self.assertTrue(modules[0])
+        self.assertTrue(modules[-1])
+
+    def test_code128_rejects_unencodable_data(self):
+        with self.assertRaises(ZplRenderError):
+            zpl_rasterizer._code128_values("caf\xe9")
+
+    # ^GF
+
+    def test_compressed_hex(self):
+        decode = zpl_rasterizer._decode_compressed_hex
+        # "," pads the row with 0, "!" with F, ":" repeats the previous row.
+        self.assertEqual(decode("FF,", 2), b"\xff\x00")
+        self.assertEqual(decode("0!", 2), b"\x0f\xff")
+        self.assertEqual(decode("IF,:", 2), b"\xff\xf0\xff\xf0")
+        # G-Y repeat 1-19 times, g-z add multiples of 20.
+        self.assertEqual(decode("gF", 10), b"\xff" * 10)
+        self.assertEqual(decode("hH0", 21), b"\x00" * 21)
+
+    def test_z64_and_b64(self):
+        raw = bytes(range(16))
+        z64 = ":Z64:" + base64.b64encode(zlib.compress(raw)).decode() + ":1234"
+        b64 = ":B64:" + base64.b64encode(raw).decode() + ":1234"
+        self.assertEqual(zpl_rasterizer._decode_graphic("A", z64, 16, 2), raw)
+        self.assertEqual(zpl_rasterizer._decode_graphic("A", b64, 16, 2), raw)
+        with self.assertRaises(ZplRenderError):
+            zpl_rasterizer._decode_graphic("A", ":Z64:AAAA:1234", 16, 2)
+
+    def test_graphic_field_is_drawn(self):
+        image = self._render("^XA^FO10,10^GFA,2,2,1,FF00^FS^XZ")
+        self.assertEqual(image.getpixel((10, 10)), 0)
+        self.assertEqual(image.getpixel((17, 10)), 0)
+        self.assertEqual(image.getpixel((10, 11)), 255)
+        self.assertEqual(image.getpixel((18, 10)), 255)
+
+    # ^FH
+
+    def test_field_hex_escapes(self):
+        canvas = zpl_rasterizer._LabelCanvas((100, 100), 203)
+        canvas._cmd_FH("")
+        canvas._cmd_FD("A_5FB_7e")
+        self.assertEqual(canvas.field_data, "A_B~")
+        canvas._reset_field()
+        canvas._cmd_FH("#")
+        canvas._cmd_FD("50#25_41")
+        self.assertEqual(canvas.field_data, "50%_41")
+
+    # ^BQ
+
+    def test_qr_code(self):
+        if zpl_rasterizer.qrcode is None:
+            self.skipTest("qrcode is not installed")
+        image = self._render("^XA^FO20,20^BQN,2,4^FDQA,https://example.com^FS^XZ")
+        # A QR code starts with a finder pattern: a black corner module.
+        self.assertEqual(image.getpixel((21, 21)), 0)
+        self.assertEqual(image.getpixel((19, 19)), 255)
+
+    def test_qr_code_data_too_long(self):
+        if zpl_rasterizer.qrcode is None:
+            self.skipTest("qrcode is not installed")
+        with self.assertRaises(ZplRenderError):
+            self._render("^XA^FO20,20^BQN,2,4^FDQA," + "x" * 5000 + "^FS^XZ", 4.0, 4.0)
@@ -0,0 +1,2 @@
+from . import labelary_client
+from . import zpl_rasterizer
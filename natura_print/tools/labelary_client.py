@@ -0,0 +1,139 @@
+"""Shared client for the Labelary ZPL rendering API.
+
+One client per base URL and settings is kept per worker process, with a
+pooled keep-alive session and a token bucket shared by every thread, so
+bursts of previews stay under Labelary's per-client request rate instead of
+being answered with 429s. ``render_many`` renders several single-label
+formats in one request through the multi-label endpoint.
+"""
+
+import io
+import threading
+import time
+import zipfile
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "https://api.labelary.com/v1"
+DEFAULT_RATE = 3.0
+DEFAULT_TIMEOUT = 10.0
+POOL_SIZE = 4
+# Labelary renders at most this many labels per request.
+MAX_LABELS_PER_REQUEST = 50
+DPMM = {"203": 8, "300": 12, "600": 24}
+
+_clients_lock = threading.Lock()
+_clients = {}
+
+
+class LabelaryError(ValueError):
+    """Raised when Labelary cannot render a label (bad input or unexpected reply)."""
+
+
+class TokenBucket:
+    """Allow ``rate`` acquisitions per second on average, in bursts of ``burst``."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = max(float(rate), 0.01)
+        self.capacity = max(float(burst or rate), 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """Take one token, waiting up to ``timeout`` seconds; return whether one was taken."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class LabelaryClient:
+    def __init__(self, base_url=DEFAULT_BASE_URL, rate=DEFAULT_RATE, timeout=DEFAULT_TIMEOUT):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _url(self, dpi, width, height, index=None):
+        dpmm = DPMM.get(str(dpi))
+        if not dpmm:
+            raise LabelaryError(f"Unsupported DPI for Labelary preview: {dpi}.")
+        url = f"{self.base_url}/printers/{dpmm}dpmm/labels/{width:g}x{height:g}/"
+        return url if index is None else f"{url}{index}/"
+
+    def _post(self, url, zpl):
+        """POST ``zpl`` and return the response, waiting out rate limits once."""
+        for attempt in range(2):
+            if not self.bucket.acquire(self.timeout):
+                raise requests.Timeout("Labelary rate limit: no request slot available.")
+            response = self.session.post(
+                url,
+                data=zpl.encode("utf-8"),
+                headers={"Accept": "image/png"},
+                timeout=self.timeout,
+            )
+            if response.status_code != 429 or attempt:
+                break
+            retry_after = response.headers.get("Retry-After", "1")
+            time.sleep(min(float(retry_after) if retry_after.isdigit() else 1.0, self.timeout))
+        if response.status_code == 400:
+            raise LabelaryError(response.text.strip() or "Labelary rejected the ZPL.")
+        response.raise_for_status()
+        return response
+
+    def render(self, zpl, dpi, width, height, index=0):
+        """Return the PNG of label ``index`` of ``zpl``."""
+        return self._post(self._url(dpi, width, height, index), zpl).content
+
+    def render_many(self, zpls, dpi, width, height):
+        """Return one PNG per single-label format in ``zpls``, batching requests."""
+        pngs = []
+        for start in range(0, len(zpls), MAX_LABELS_PER_REQUEST):
+            batch = zpls[start:start + MAX_LABELS_PER_REQUEST]
+            if len(batch) == 1:
+                pngs.append(self.render(batch[0], dpi, width, height))
+                continue
+            response = self._post(self._url(dpi, width, height), "\n".join(batch))
+            images = _split_images(response.content)
+            if len(images) != len(batch):
+                raise LabelaryError(
+                    f"Labelary returned {len(images)} images for {len(batch)} labels."
+                )
+            pngs.extend(images)
+        return pngs
+
+
+def _split_images(content):
+    """Return the PNGs of a multi-label reply: a ZIP of PNGs, or a single PNG."""
+    if not content.startswith(b"PK"):
+        return [content]
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        names = sorted(
+            (name for name in archive.namelist() if name.lower().endswith(".png")),
+            key=lambda name: (len(name), name),
+        )
+        return [archive.read(name) for name in names]
+
+
+def get_client(base_url=DEFAULT_BASE_URL, rate=DEFAULT_RATE, timeout=DEFAULT_TIMEOUT):
+    """Return this worker's shared client (session and rate limit) for these settings."""
+    key = (base_url, rate, timeout)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = LabelaryClient(base_url, rate, timeout)
+        return client
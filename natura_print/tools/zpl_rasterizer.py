@@ -0,0 +1,539 @@
+"""Offline rasterizer for the subset of ZPL used by Natura Print templates.
+
+Renders ``^XA`` ... ``^XZ`` formats to PNG without leaving the server:
+fields placed with ``^FO`` / ``^FT`` (and ``^LH``), text set with ``^A`` /
+``^CF`` (with ``^FB`` blocks and ``^FH`` hex escapes), boxes and circles
+(``^GB``, ``^GC``), graphic fields (``^GF`` in ASCII hex, compressed hex,
+``:Z64:`` and ``:B64:``) and Code 128 / QR barcodes (``^BC``, ``^BQ``, with
+``^BY`` defaults). Other commands are ignored and unsupported barcodes are
+drawn as placeholders, so the result is a close preview, not a printer
+emulation.
+
+Fonts are approximated with DejaVu Sans (or Pillow's default font), and QR
+codes need the ``qrcode`` package; without it a placeholder is drawn.
+"""
+
+import base64
+import binascii
+import io
+import re
+import zlib
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q
+    from qrcode.exceptions import DataOverflowError
+except ImportError:
+    qrcode = None
+
+# Refuse absurd label sizes instead of allocating gigabytes.
+MAX_PIXELS = 40_000_000
+
+FORMAT_RE = re.compile(r"\^XA(.*?)(?:\^XZ|$)", re.DOTALL | re.IGNORECASE)
+HEX_ESCAPE_RE = re.compile(r"_([0-9A-Fa-f]{2})")
+
+ROTATIONS = {"N": 0, "R": 270, "I": 180, "B": 90}
+
+# Code 128 bar/space widths for symbol values 0-106 (106 is the stop pattern).
+CODE128_PATTERNS = (
+    "212222 222122 222221 121223 121322 131222 122213 122312 132212 221213 "
+    "221312 231212 112232 122132 122231 113222 123122 123221 223211 221132 "
+    "221231 213212 223112 312131 311222 321122 321221 312212 322112 322211 "
+    "212123 212321 232121 111323 131123 131321 112313 132113 132311 211313 "
+    "231113 231311 112133 112331 132131 113123 113321 133121 313121 211331 "
+    "231131 213113 213311 213131 311123 311321 331121 312113 312311 332111 "
+    "314111 221411 431111 111224 111422 121124 121421 141122 141221 112214 "
+    "112412 122114 122411 142112 142211 241211 221114 413111 241112 134111 "
+    "111242 121142 121241 114212 124112 124211 411212 421112 421211 212141 "
+    "214121 412121 111143 111341 131141 114113 114311 411113 411311 113141 "
+    "114131 311141 411131 211412 211214 211232 2331112"
+).split()
+CODE128_START_B = 104
+CODE128_START_C = 105
+CODE128_CODE_B = 100
+CODE128_CODE_C = 99
+CODE128_STOP = 106
+# ^BC invocation codes (">;" start C, ">:" start B, ...) chosen by the printer.
+CODE128_INVOCATION_RE = re.compile(r">[0-9:;<=>]")
+
+
+class ZplRenderError(ValueError):
+    """Raised when a label cannot be rasterized."""
+
+
+def render_png(zpl, dpi, width_in, height_in):
+    """Return the PNG bytes of the first label of ``zpl``."""
+    labels = render_labels(zpl, dpi, width_in, height_in, limit=1)
+    if not labels:
+        raise ZplRenderError("No ^XA...^XZ label format found.")
+    return labels[0]
+
+
+def render_labels(zpl, dpi, width_in, height_in, limit=None):
+    """Return the PNG bytes of each ``^XA`` ... ``^XZ`` format of ``zpl``."""
+    dpi = int(dpi)
+    size = (max(1, round(width_in * dpi)), max(1, round(height_in * dpi)))
+    if size[0] * size[1] > MAX_PIXELS:
+        raise ZplRenderError(f"Label of {size[0]}x{size[1]} dots is too large to preview.")
+    pngs = []
+    for match in FORMAT_RE.finditer(zpl or ""):
+        image = _LabelCanvas(size, dpi).render(match.group(1))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        pngs.append(buffer.getvalue())
+        if limit and len(pngs) >= limit:
+            break
+    return pngs
+
+
+def _to_int(value, default=0):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def _params(text, count):
+    values = text.split(",")
+    return [value.strip() for value in values] + [""] * (count - len(values))
+
+
+def _commands(body):
+    """Yield ``(command, params)`` for each ``^`` command of a format body."""
+    for token in body.split("^")[1:]:
+        if not token:
+            continue
+        # ^A takes its font name right after the command letter (^A0N, ^ADN...).
+        size = 1 if token[0].upper() == "A" and token[:2].upper() != "A@" else 2
+        yield token[:size].upper(), token[size:]
+
+
+@lru_cache(maxsize=64)
+def _font(size):
+    size = max(size, 4)
+    for name in ("DejaVuSans.ttf", "DejaVuSansCondensed.ttf", "LiberationSans-Regular.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def _code128_values(data):
+    """Return Code 128 symbol values (start code to checksum) for ``data``."""
+    data = CODE128_INVOCATION_RE.sub("", data)
+    values = []
+    index = 0
+    digits_run = len(data) - len(data.lstrip("0123456789"))
+    if digits_run >= 4 and (digits_run == len(data) or digits_run >= 6):
+        values.append(CODE128_START_C)
+        code = "C"
+    else:
+        values.append(CODE128_START_B)
+        code = "B"
+    while index < len(data):
+        run = len(data[index:]) - len(data[index:].lstrip("0123456789"))
+        if code == "C":
+            if run >= 2:
+                values.append(int(data[index:index + 2]))
+                index += 2
+                continue
+            values.append(CODE128_CODE_B)
+            code = "B"
+        elif run >= 6 and run % 2 == 0:
+            values.append(CODE128_CODE_C)
+            code = "C"
+            continue
+        char = ord(data[index])
+        if not 32 <= char <= 126:
+            raise ZplRenderError(f"Cannot encode {data[index]!r} in Code 128 subset B.")
+        values.append(char - 32)
+        index += 1
+    checksum = values[0] + sum(position * value for position, value in enumerate(values[1:], 1))
+    values.append(checksum % 103)
+    return values
+
+
+def _code128_modules(data):
+    """Return the bar pattern of ``data`` as a list of booleans (True = bar)."""
+    modules = []
+    for value in _code128_values(data) + [CODE128_STOP]:
+        for position, width in enumerate(CODE128_PATTERNS[value]):
+            modules.extend([position % 2 == 0] * int(width))
+    return modules
+
+
+class _LabelCanvas:
+    """Draw one label format; keeps the ZPL state that spans fields."""
+
+    def __init__(self, size, dpi):
+        self.image = Image.new("L", size, 255)
+        self.draw = ImageDraw.Draw(self.image)
+        self.dpi = dpi
+        self.home = (0, 0)
+        self.default_font = (_to_int(dpi / 203 * 9, 9), _to_int(dpi / 203 * 5, 5))
+        self.default_orientation = "N"
+        self.bar_defaults = {"module": 2, "ratio": 3.0, "height": 10}
+        self.field_data = None
+        self._reset_field()
+
+    def _reset_field(self):
+        self.origin = (0, 0)
+        self.typeset = False
+        self.font = None
+        self.orientation = None
+        self.block = None
+        self.hex_indicator = None
+        self.barcode = None
+        self.reverse = False
+
+    def render(self, body):
+        for command, params in _commands(body):
+            handler = getattr(self, f"_cmd_{command}", None)
+            if handler:
+                handler(params)
+        return self.image
+
+    # Position and defaults
+
+    def _cmd_LH(self, params):
+        x, y = _params(params, 2)[:2]
+        self.home = (_to_int(x), _to_int(y))
+
+    def _cmd_FO(self, params):
+        x, y = _params(params, 2)[:2]
+        self.origin = (self.home[0] + _to_int(x), self.home[1] + _to_int(y))
+        self.typeset = False
+
+    def _cmd_FT(self, params):
+        self._cmd_FO(params)
+        self.typeset = True
+
+    def _cmd_CF(self, params):
+        _name, height, width = _params(params, 3)[:3]
+        height = _to_int(height, self.default_font[0])
+        self.default_font = (height, _to_int(width, self.default_font[1] if not height else height))
+
+    def _cmd_FW(self, params):
+        orientation = params[:1].upper()
+        if orientation in ROTATIONS:
+            self.default_orientation = orientation
+
+    def _cmd_BY(self, params):
+        module, ratio, height = _params(params, 3)[:3]
+        self.bar_defaults = {
+            "module": _to_int(module, self.bar_defaults["module"]) or 2,
+            "ratio": float(ratio) if ratio.replace(".", "", 1).isdigit() else self.bar_defaults["ratio"],
+            "height": _to_int(height, self.bar_defaults["height"]) or 10,
+        }
+
+    # Field options
+
+    def _cmd_A(self, params):
+        spec = params[1:] if params else ""
+        orientation = spec[:1].upper()
+        if orientation in ROTATIONS:
+            self.orientation = orientation
+            spec = spec[1:]
+        height, width = _params(spec.lstrip(","), 2)[:2]
+        height = _to_int(height, self.default_font[0])
+        self.font = (height, _to_int(width, height))
+
+    def _cmd_FB(self, params):
+        width, lines, spacing, justify, _indent = _params(params, 5)[:5]
+        self.block = {
+            "width": _to_int(width, 0),
+            "lines": _to_int(lines, 1) or 1,
+            "spacing": _to_int(spacing, 0),
+            "justify": (justify or "L").upper()[:1],
+        }
+
+    def _cmd_FH(self, params):
+        self.hex_indicator = params[:1] or "_"
+
+    def _cmd_FR(self, params):
+        self.reverse = True
+
+    def _cmd_BC(self, params):
+        orientation, height, line, above = _params(params, 4)[:4]
+        self.barcode = {
+            "type": "code128",
+            "orientation": orientation.upper()[:1] or None,
+            "height": _to_int(height, self.bar_defaults["height"]),
+            "line": (line or "Y").upper() != "N",
+            "above": (above or "N").upper() == "Y",
+        }
+
+    def _cmd_BQ(self, params):
+        orientation, _model, magnification = _params(params, 3)[:3]
+        self.barcode = {
+            "type": "qr",
+            "orientation": orientation.upper()[:1] or None,
+            "magnification": min(max(_to_int(magnification, 2), 1), 10),
+        }
+
+    def _cmd_FD(self, params):
+        data = params
+        if self.hex_indicator:
+            indicator = re.escape(self.hex_indicator)
+            data = re.sub(
+                f"{indicator}([0-9A-Fa-f]{{2}})",
+                lambda match: bytes.fromhex(match.group(1)).decode("latin-1"),
+                data,
+            )
+        self.field_data = data
+
+    def _cmd_FS(self, params):
+        data = self.field_data
+        if data is not None:
+            if self.barcode and self.barcode["type"] == "code128":
+                self._draw_code128(data)
+            elif self.barcode and self.barcode["type"] == "qr":
+                self._draw_qr(data)
+            elif self.barcode:
+                self._draw_placeholder(self.barcode.get("height") or 50, data)
+            else:
+                self._draw_text(data)
+        self.field_data = None
+        self._reset_field()
+
+    def __getattr__(self, name):
+        # Other barcode commands (^B3, ^BE, ...): remember to draw a placeholder.
+        if name.startswith("_cmd_B") and len(name) == 7:
+            def barcode(params):
+                height = _to_int(_params(params, 3)[1], self.bar_defaults["height"])
+                self.barcode = {"type": "other", "orientation": None, "height": height}
+            return barcode
+        raise AttributeError(name)
+
+    # Graphics
+
+    def _cmd_GB(self, params):
+        width, height, thickness, color, _rounding = _params(params, 5)[:5]
+        thickness = _to_int(thickness, 1) or 1
+        width = max(_to_int(width, thickness), thickness)
+        height = max(_to_int(height, thickness), thickness)
+        ink = 255 if (color or "B").upper() == "W" else 0
+        x, y = self.origin
+        box = [x, y, x + width - 1, y + height - 1]
+        if thickness * 2 >= min(width, height):
+            self.draw.rectangle(box, fill=ink)
+        else:
+            self.draw.rectangle(box, outline=ink, width=thickness)
+
+    def _cmd_GC(self, params):
+        diameter, thickness, color = _params(params, 3)[:3]
+        diameter = max(_to_int(diameter, 3), 3)
+        thickness = _to_int(thickness, 1) or 1
+        ink = 255 if (color or "B").upper() == "W" else 0
+        x, y = self.origin
+        self.draw.ellipse([x, y, x + diameter - 1, y + diameter - 1], outline=ink, width=thickness)
+
+    def _cmd_GF(self, params):
+        fmt, _binary_bytes, total, per_row, data = (params.split(",", 4) + [""] * 5)[:5]
+        total = _to_int(total)
+        per_row = _to_int(per_row)
+        if total <= 0 or per_row <= 0:
+            return
+        raw = _decode_graphic(fmt.strip().upper() or "A", data, total, per_row)
+        rows = len(raw) // per_row
+        if not rows:
+            return
+        mask = Image.frombytes("1", (per_row * 8, rows), raw[: rows * per_row]).convert("L")
+        self.image.paste(0, self.origin, mask)
+
+    # Fields
+
+    def _rotated_paste(self, drawing, orientation, anchor_bottom=False):
+        """Paste the black pixels of ``drawing`` (``L``, white background) at the origin."""
+        orientation = orientation or self.default_orientation
+        if ROTATIONS.get(orientation):
+            drawing = drawing.rotate(ROTATIONS[orientation], expand=True, fillcolor=255)
+        x, y = self.origin
+        if anchor_bottom:
+            y -= drawing.height
+        mask = drawing.point(lambda value: 255 - value)
+        if self.reverse:
+            region = self.image.crop((x, y, x + drawing.width, y + drawing.height))
+            inverted = region.point(lambda value: 255 - value)
+            self.image.paste(inverted, (x, y), mask)
+        else:
+            self.image.paste(0, (x, y), mask)
+
+    def _draw_text(self, data):
+        height, width = self.font or self.default_font
+        font = _font(height)
+        if self.block:
+            lines = self._wrap(data, font, width / height if height else 1)
+        else:
+            lines = [data.replace("\\&", " ")]
+        line_height = height + (self.block["spacing"] if self.block else 0)
+        block_width = self.block["width"] if self.block and self.block["width"] else None
+        widths = [font.getlength(line) * width / max(height, 1) for line in lines]
+        canvas_width = int(block_width or max(widths or [1])) + 2
+        # Leave room below the last line for descenders.
+        glyph_height = int(height * 1.25) + 2
+        drawing = Image.new(
+            "L", (max(canvas_width, 1), max(line_height * (len(lines) - 1) + glyph_height, 1)), 255
+        )
+        for index, line in enumerate(lines):
+            line_image = Image.new("L", (max(int(font.getlength(line)) + 2, 1), glyph_height), 255)
+            ImageDraw.Draw(line_image).text((0, 0), line, font=font, fill=0, anchor="la")
+            if width != height and height:
+                line_image = line_image.resize(
+                    (max(int(line_image.width * width / height), 1), line_image.height)
+                )
+            offset = 0
+            if block_width:
+                justify = self.block["justify"]
+                if justify == "C":
+                    offset = (block_width - line_image.width) // 2
+                elif justify == "R":
+                    offset = block_width - line_image.width
+            drawing.paste(line_image, (max(offset, 0), index * line_height))
+        self._rotated_paste(drawing, self.orientation, anchor_bottom=self.typeset)
+
+    def _wrap(self, data, font, scale):
+        block = self.block
+        lines = []
+        for paragraph in data.split("\\&"):
+            words = paragraph.split(" ")
+            current = ""
+            for word in words:
+                candidate = f"{current} {word}".strip() if current else word
+                if block["width"] and current and font.getlength(candidate) * scale > block["width"]:
+                    lines.append(current)
+                    current = word
+                else:
+                    current = candidate
+            lines.append(current)
+        return lines[: block["lines"]]
+
+    def _draw_code128(self, data):
+        barcode = self.barcode
+        module = self.bar_defaults["module"]
+        try:
+            modules = _code128_modules(data)
+        except ZplRenderError:
+            self._draw_placeholder(barcode["height"], data)
+            return
+        height = barcode["height"] or self.bar_defaults["height"]
+        text_height = max(int(module * 10), 12) if barcode["line"] else 0
+        drawing = Image.new("L", (len(modules) * module, height + text_height + 2), 255)
+        draw = ImageDraw.Draw(drawing)
+        bar_top = text_height + 2 if barcode["above"] else 0
+        for index, bar in enumerate(modules):
+            if bar:
+                left = index * module
+                draw.rectangle([left, bar_top, left + module - 1, bar_top + height - 1], fill=0)
+        if barcode["line"]:
+            font = _font(text_height)
+            text_top = 0 if barcode["above"] else height + 2
+            text = CODE128_INVOCATION_RE.sub("", data)
+            draw.text((drawing.width / 2, text_top), text, font=font, fill=0, anchor="ma")
+        self._rotated_paste(drawing, barcode["orientation"], anchor_bottom=self.typeset)
+
+    def _draw_qr(self, data):
+        magnification = self.barcode["magnification"]
+        # Field data is "<error correction><input mode>,<data>", e.g. "QA,https://...".
+        level, _sep, text = data.partition(",")
+        if not _sep:
+            level, text = "Q", data
+        if qrcode is None:
+            self._draw_placeholder(magnification * 25, "QR")
+            return
+        levels = {"H": ERROR_CORRECT_H, "Q": ERROR_CORRECT_Q, "M": ERROR_CORRECT_M, "L": ERROR_CORRECT_L}
+        code = qrcode.QRCode(
+            error_correction=levels.get(level[:1].upper(), ERROR_CORRECT_Q), border=0, box_size=1
+        )
+        code.add_data(text)
+        try:
+            # Depending on the qrcode release, overflowing data raises either.
+            code.make(fit=True)
+        except (DataOverflowError, ValueError) as exc:
+            raise ZplRenderError(f"QR code data is too long ({len(text)} characters).") from exc
+        matrix = code.get_matrix()
+        drawing = Image.new("L", (len(matrix[0]), len(matrix)), 255)
+        drawing.putdata([0 if cell else 255 for row in matrix for cell in row])
+        drawing = drawing.resize(
+            (drawing.width * magnification, drawing.height * magnification), Image.NEAREST
+        )
+        self._rotated_paste(drawing, self.barcode["orientation"])
+
+    def _draw_placeholder(self, height, label):
+        width = max(height * 2, 40)
+        drawing = Image.new("L", (width, max(height, 20)), 255)
+        draw = ImageDraw.Draw(drawing)
+        draw.rectangle([0, 0, drawing.width - 1, drawing.height - 1], outline=0, width=2)
+        draw.line([0, 0, drawing.width - 1, drawing.height - 1], fill=0, width=1)
+        draw.text((4, 4), str(label)[:24], font=_font(12), fill=0)
+        self._rotated_paste(drawing, None)
+
+
+def _decode_graphic(fmt, data, total, per_row):
+    """Return the bitmap bytes of a ^GF field (bit set = black)."""
+    data = data.strip()
+    if data.startswith((":Z64:", ":B64:")):
+        encoded = data[5:].split(":", 1)[0]
+        try:
+            raw = base64.b64decode(encoded)
+            if data.startswith(":Z64:"):
+                raw = zlib.decompress(raw)
+        except (binascii.Error, zlib.error) as exc:
+            raise ZplRenderError(f"Invalid ^GF data: {exc}") from exc
+    elif fmt == "A":
+        raw = _decode_compressed_hex(data, per_row)
+    else:
+        raw = data.encode("latin-1", "replace")
+    return raw[:total].ljust(total, b"\x00")
+
+
+def _decode_compressed_hex(data, per_row):
+    """Decode ASCII hex ^GF data, including the ZPL compression scheme.
+
+    G-Y repeat the next digit 1-19 times and g-z add multiples of 20; ","
+    pads the row with zeros, "!" with ones and ":" repeats the previous row.
+    """
+    row_digits = per_row * 2
+    rows = []
+    current = []
+    repeat = 0
+    previous = "0" * row_digits
+
+    def flush():
+        nonlocal current, previous
+        row = "".join(current)
+        while len(row) >= row_digits:
+            rows.append(row[:row_digits])
+            previous = row[:row_digits]
+            row = row[row_digits:]
+        current = [row] if row else []
+
+    for char in data:
+        if "G" <= char <= "Y":
+            repeat += ord(char) - ord("G") + 1
+        elif "g" <= char <= "z":
+            repeat += (ord(char) - ord("g") + 1) * 20
+        elif char in "0123456789ABCDEFabcdef":
+            current.append(char * (repeat or 1))
+            repeat = 0
+            flush()
+        elif char == ",":
+            current = ["".join(current).ljust(row_digits, "0")]
+            flush()
+        elif char == "!":
+            current = ["".join(current).ljust(row_digits, "F")]
+            flush()
+        elif char == ":":
+            rows.append(previous)
+    flush()
+    try:
+        return bytes.fromhex("".join(rows))
+    except ValueError as exc:
+        raise ZplRenderError(f"Invalid ^GF data: {exc}") from exc
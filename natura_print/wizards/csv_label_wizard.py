@@ -1,18 +1,28 @@
 import base64
+import codecs
 import csv
 import io
 import html
 import json
 import re
+from contextlib import contextmanager
+from itertools import chain, islice
 
-import requests
+from PIL import Image
 
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
 
 
 CSV_BATCH_SIZE = 12
+# Labels shown side by side in the CSV row preview.
+ROW_PREVIEW_MAX_LABELS = 12
+ROW_PREVIEW_GAP = 24
 CSV_PREVIEW_ROWS = 10
+# Base64 characters decoded at a time when reading an upload (a multiple of 4).
+CSV_DECODE_CHUNK = 256 * 1024
+# The CSV index keeps the byte offset of every Nth row, to seek to a start row.
+CSV_INDEX_STRIDE = 1000
 GROUPED_PLACEHOLDER_RE = re.compile(r"^(.*)_R(\d+)$", re.IGNORECASE)
 
 
@@ -28,7 +38,11 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
     printer_id = fields.Many2one(
         "printers.list",
         string="Printer",
-        required=True,
+    )
+    pool_id = fields.Many2one(
+        "natura.print.printer.pool",
+        string="Printer Pool",
+        help="Split the rows across the available printers of this pool instead.",
     )
     delimiter = fields.Char(
         string="Delimiter",
@@ -54,17 +68,41 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
         help="Preview of the CSV header and first rows.",
     )
     mapping_json = fields.Text(string="Mapping JSON")
+    csv_index = fields.Text(
+        string="CSV Index",
+        help="Header, row count and row offsets of the uploaded file, kept so later "
+        "steps do not parse it again (JSON).",
+    )
     source_model = fields.Char(string="Source Model", readonly=True)
     source_res_id = fields.Integer(string="Source Record", readonly=True)
-    preview_image = fields.Binary(string="Preview", attachment=False)
+    # Id of the shared preview cache attachment, see natura.print.service.
+    preview_attachment_id = fields.Integer(string="Preview Attachment")
+    preview_image = fields.Binary(string="Preview", compute="_compute_preview_image")
     preview_error = fields.Char(string="Preview Error", readonly=True)
+    preview_backend = fields.Selection(related="template_id.preview_backend")
+    rows_preview_image = fields.Binary(
+        string="CSV Label Preview",
+        attachment=False,
+        help="The labels Test Print would send, rendered from the mapped CSV rows.",
+    )
     test_print_done = fields.Boolean(string="Test Print Done", default=False)
+    last_run_summary = fields.Char(
+        string="Last Run",
+        readonly=True,
+        help="Batch size chosen by the adaptive chunker during the last print run.",
+    )
     mapping_line_ids = fields.One2many(
         "natura.print.csv.mapping.line",
         "wizard_id",
         string="Mappings",
     )
 
+    @api.depends("preview_attachment_id")
+    def _compute_preview_image(self):
+        for wizard in self:
+            attachment = self.env["ir.attachment"].sudo().browse(wizard.preview_attachment_id)
+            wizard.preview_image = attachment.exists().datas if attachment else False
+
     @api.model
     def default_get(self, fields_list):
         res = super().default_get(fields_list)
@@ -92,17 +130,19 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
                 )
                 for placeholder in placeholders
             ]
-            if "preview_image" in fields_list:
-                preview = self._render_preview_image(template, base_values)
+            if "preview_attachment_id" in fields_list:
+                # Only show an already rendered preview; Show Preview renders one.
+                preview = self._render_preview_image(template, base_values, cached_only=True)
                 if preview:
-                    res["preview_image"] = preview
+                    res["preview_attachment_id"] = preview.id
         return res
 
     @api.onchange("template_id")
     def _onchange_template_id(self):
+        self.rows_preview_image = False
         if not self.template_id:
             self.mapping_line_ids = [(5, 0, 0)]
-            self.preview_image = False
+            self.preview_attachment_id = 0
             self.preview_error = False
             return
         placeholders, group_map = self._collapse_grouped_placeholders(
@@ -123,18 +163,124 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
             )
             for placeholder in placeholders
         ]
-        self._update_preview_image(silent=True)
+        self._update_preview_image(silent=True, cached_only=True)
+
+    def _get_csv_attachment(self):
+        if not isinstance(self.id, int):
+            return self.env["ir.attachment"]
+        return self.env["ir.attachment"].sudo().search(
+            [("res_model", "=", self._name), ("res_field", "=", "csv_file"), ("res_id", "=", self.id)],
+            limit=1,
+        )
+
+    @contextmanager
+    def _open_csv(self, attachment, offset=0):
+        """Yield the upload as a binary stream at byte ``offset``, never loaded whole.
 
-    def _decode_csv(self):
+        Decoding errors raised while the stream is read become a ``UserError``.
+        """
         self.ensure_one()
-        if not self.csv_file:
+        if attachment.store_fname:
+            raw = open(attachment._full_path(attachment.store_fname), "rb")
+        elif attachment:
+            raw = io.BytesIO(attachment.raw)
+        elif self.csv_file:
+            # Not saved yet (onchange): decode the base64 upload chunk by chunk.
+            raw = io.BufferedReader(_Base64Reader(self.csv_file))
+        else:
             raise UserError(_("Please upload a CSV file."))
-        encoding = self.env.user.natura_print_csv_encoding or "utf-8"
+        with raw:
+            if offset:
+                raw.seek(offset)
+            try:
+                yield raw
+            except (UnicodeDecodeError, csv.Error) as exc:
+                encoding = self._get_csv_encoding()
+                raise UserError(_("Failed to decode CSV using %s: %s") % (encoding, exc)) from exc
+
+    def _get_csv_encoding(self):
+        return self.env.user.natura_print_csv_encoding or "utf-8"
+
+    def _get_csv_index(self, attachment):
+        """Return the parse index of the stored upload, reset when the file,
+        delimiter or encoding changed.
+
+        ``offsets[i]`` is the byte offset of row ``i * CSV_INDEX_STRIDE``;
+        ``rows`` (the row count, header included) is known once a read
+        reached the end of the file.
+        """
+        key = f"{attachment.checksum}:{self.delimiter or ','}:{self._get_csv_encoding()}"
+        index = json.loads(self.csv_index or "{}")
+        if index.get("key") != key:
+            index = {"key": key, "header": None, "rows": None, "offsets": [0]}
+        return index
+
+    def _iter_csv_rows(self, start_index=0, end_index=None):
+        """Yield rows ``start_index`` to ``end_index`` (0 is the header row), reading lazily.
+
+        Once the wizard is saved, reading starts from the nearest indexed row
+        before ``start_index`` and extends the index on the way, so each row
+        range is parsed at most once per file.
+        """
+        attachment = self._get_csv_attachment()
+        index = self._get_csv_index(attachment) if attachment else None
+        offsets = index["offsets"] if index else [0]
+        if index and index["rows"] is not None and start_index >= index["rows"]:
+            return
+        checkpoint = min(start_index // CSV_INDEX_STRIDE, len(offsets) - 1)
+        row_number = checkpoint * CSV_INDEX_STRIDE
+        position = [offsets[checkpoint]]
+        decoder = codecs.getincrementaldecoder(self._get_csv_encoding())()
+        known = json.dumps(index)
+
+        def lines(raw):
+            for line in raw:
+                position[0] += len(line)
+                yield decoder.decode(line)
+
         try:
-            data = base64.b64decode(self.csv_file)
-            return data.decode(encoding)
-        except Exception as exc:
-            raise UserError(_("Failed to decode CSV using %s: %s") % (encoding, exc)) from exc
+            with self._open_csv(attachment, position[0]) as raw:
+                row_start = position[0]
+                for row in csv.reader(lines(raw), delimiter=(self.delimiter or ",")[:1]):
+                    if row_number == len(offsets) * CSV_INDEX_STRIDE:
+                        offsets.append(row_start)
+                    if end_index is not None and row_number >= end_index:
+                        break
+                    if row_number >= start_index:
+                        yield row
+                    row_number += 1
+                    row_start = position[0]
+                else:
+                    if index:
+                        index["rows"] = row_number
+        finally:
+            if index and json.dumps(index) != known:
+                self.csv_index = json.dumps(index)
+
+    def _get_csv_header_row(self):
+        attachment = self._get_csv_attachment()
+        if attachment:
+            index = self._get_csv_index(attachment)
+            if index["header"] is not None:
+                return index["header"]
+        rows = self._iter_csv_rows(0, 1)
+        header = next(rows, [])
+        rows.close()
+        if attachment:
+            # Re-read: the row iterator may have extended the stored index.
+            index = self._get_csv_index(attachment)
+            index["header"] = header
+            self.csv_index = json.dumps(index)
+        return header
+
+    def _count_csv_rows(self, start_index, end_index=None):
+        """Return the number of rows from ``start_index`` to ``end_index``."""
+        attachment = self._get_csv_attachment()
+        total = self._get_csv_index(attachment)["rows"] if attachment else None
+        if total is None:
+            return sum(1 for _row in self._iter_csv_rows(start_index, end_index))
+        end = total if end_index is None else min(end_index, total)
+        return max(end - start_index, 0)
 
     def _get_source_record(self):
         self.ensure_one()
@@ -160,28 +306,13 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
             source = self.env["zpl.label.template"].browse()
         return template._values_from_record(source) if source else {}
 
-    def _render_preview_image(self, template, values):
-        if not template:
-            return False
-        dpmm = template._labelary_dpmm()
-        if not dpmm or not template.width or not template.height:
+    def _render_preview_image(self, template, values, cached_only=False):
+        """Return the cached preview attachment of ``template`` filled with ``values``."""
+        if not template or not template.width or not template.height:
             return False
         zpl = template._render_zpl_from_values(values or {})
-        url = (
-            f"https://api.labelary.com/v1/printers/{dpmm}dpmm/"
-            f"labels/{template.width}x{template.height}/0/"
-        )
-        try:
-            response = requests.post(
-                url,
-                data=zpl.encode("utf-8"),
-                headers={"Accept": "image/png"},
-                timeout=10,
-            )
-            response.raise_for_status()
-            return base64.b64encode(response.content)
-        except requests.RequestException:
-            return False
+        preview = template._get_preview_attachment(zpl, cached_only=cached_only)
+        return preview if isinstance(preview, models.BaseModel) else False
 
     @staticmethod
     def _normalize_header(value):
@@ -218,22 +349,13 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
             return base_values.get(group_items[0], "")
         return ""
 
-    def _parse_headers(self, text):
-        reader = csv.reader(io.StringIO(text), delimiter=(self.delimiter or ",")[:1])
-        rows = list(reader)
-        if not rows:
-            return []
-        headers = [header.strip() for header in rows[0]]
+    def _parse_headers(self, row):
+        headers = [header.strip() for header in row]
         if headers:
             headers[0] = headers[0].lstrip("\ufeff")
         return headers
 
-    def _build_csv_preview(self, rows):
-        if not rows:
-            return ""
-        header = rows[0]
-        start_index = max((self.start_row or 2) - 1, 1)
-        sample_rows = rows[start_index:start_index + CSV_PREVIEW_ROWS]
+    def _build_csv_preview(self, header, sample_rows):
         header_cells = "".join(
             f"<th>{html.escape(str(cell or '').strip())}</th>" for cell in header
         )
@@ -260,18 +382,19 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
             self.csv_headers_display = False
             self.csv_preview = False
             return
+        start_index = max((self.start_row or 2) - 1, 1)
         try:
-            text = self._decode_csv()
+            rows = self._iter_csv_rows(0, start_index + CSV_PREVIEW_ROWS)
+            header = next(rows, [])
+            sample_rows = list(islice(rows, start_index - 1, None))
         except UserError:
             self.csv_headers_display = False
             self.csv_preview = False
             return
-        headers = self._parse_headers(text)
+        headers = self._parse_headers(header)
         headers_text = ", ".join([header for header in headers if header])
         self.csv_headers_display = headers_text or self.csv_filename
-        reader = csv.reader(io.StringIO(text), delimiter=(self.delimiter or ",")[:1])
-        rows = list(reader)
-        self.csv_preview = self._build_csv_preview(rows)
+        self.csv_preview = self._build_csv_preview(header, sample_rows) if header else ""
         normalized = {self._normalize_header(h): h for h in headers}
         for line in self.mapping_line_ids:
             if line.column_selector:
@@ -297,21 +420,22 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
                 }
             )
         self.mapping_json = json.dumps(lines)
+        self.rows_preview_image = False
 
-    def _update_preview_image(self, silent=False):
+    def _update_preview_image(self, silent=False, cached_only=False):
         self.ensure_one()
         self.preview_error = False
         if not self.template_id:
-            self.preview_image = False
+            self.preview_attachment_id = 0
             return
         values = self._build_base_values(self.template_id)
-        preview = self._render_preview_image(self.template_id, values)
+        preview = self._render_preview_image(self.template_id, values, cached_only=cached_only)
         if not preview:
-            self.preview_image = False
+            self.preview_attachment_id = 0
             if not silent:
                 self.preview_error = "Preview failed to generate."
             return
-        self.preview_image = preview
+        self.preview_attachment_id = preview.id
 
     def _column_ref_to_index(self, ref):
         if not ref:
@@ -367,36 +491,6 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
                 mapping[placeholder] = idx
         return mapping
 
-    def _send_batch(self, batch_zpl):
-        params = self.env["ir.config_parameter"].sudo()
-        hostname = params.get_param("natura_print.hostname")
-        api_user = params.get_param("natura_print.api_user")
-        api_password = params.get_param("natura_print.api_password")
-
-        if not hostname or not api_user or not api_password:
-            raise UserError(
-                _(
-                    "Missing configuration. Set Hostname, API User, and API Password "
-                    "under Settings > Configuration."
-                )
-            )
-
-        payload = {
-            "zpl": batch_zpl,
-            "printer_ip": self.printer_id.ip_address,
-            "qty": 1,
-        }
-        try:
-            response = requests.post(
-                hostname,
-                json=payload,
-                auth=(api_user, api_password),
-                timeout=10,
-            )
-            response.raise_for_status()
-        except requests.RequestException as exc:
-            raise UserError(_("Print failed: %s") % exc) from exc
-
     def _return_wizard_action(self):
         return {
             "type": "ir.actions.act_window",
@@ -406,18 +500,6 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
             "target": "new",
         }
 
-    def _get_csv_data(self):
-        self.ensure_one()
-        # Ensure any inline edits in the one2many are persisted before reading.
-        self.env.flush_all()
-        text = self._decode_csv()
-        delimiter = (self.delimiter or ",")[:1]
-        reader = csv.reader(io.StringIO(text), delimiter=delimiter)
-        rows = list(reader)
-        if not rows:
-            raise UserError(_("CSV file is empty."))
-        return rows
-
     def _get_mapping(self, headers):
         mapping = {}
         # Prefer JSON snapshot from onchange (round-tripped via hidden field).
@@ -451,19 +533,16 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
         aligned = (count // rows_per_label) * rows_per_label
         return max(rows_per_label, aligned) if aligned else rows_per_label
 
-    def _print_csv_range(self, rows, start_index, end_index):
-        headers = rows[0]
-        mapping = self._get_mapping(headers)
-        source_record = self._get_source_record()
-        base_values = self.template_id._values_from_record(source_record) if source_record else {}
-        if start_index >= len(rows) or start_index >= end_index:
-            raise UserError(_("Start row is beyond the end of the CSV file."))
-
+    def _iter_label_values(self, rows, mapping, base_values):
+        """Yield the placeholder values of each label built from ``rows``, consumed lazily."""
         rows_per_label, group_map = self._get_rows_per_label()
-        batch = []
-        for label_start in range(start_index, min(end_index, len(rows)), rows_per_label):
+        rows = iter(rows)
+        while True:
+            label_rows = list(islice(rows, rows_per_label))
+            if not label_rows:
+                return
             values = dict(base_values)
-            current_row = rows[label_start]
+            current_row = label_rows[0]
             for placeholder, idx in mapping.items():
                 if placeholder in group_map:
                     continue
@@ -474,36 +553,149 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
                 if idx is None:
                     continue
                 for offset, placeholder in enumerate(placeholders):
-                    row_idx = label_start + offset
-                    if row_idx >= len(rows) or row_idx >= end_index:
+                    if offset >= len(label_rows):
                         values[placeholder] = ""
                         continue
-                    row = rows[row_idx]
+                    row = label_rows[offset]
                     values[placeholder] = row[idx] if idx < len(row) else ""
-            zpl = self.template_id._render_zpl_from_values(values)
-            batch.append(zpl)
-            if len(batch) >= CSV_BATCH_SIZE:
-                self._send_batch("".join(batch))
-                batch = []
-        if batch:
-            self._send_batch("".join(batch))
+            yield values
+
+    def _print_csv_range(self, start_index, end_index=None, direct=False):
+        """Print CSV rows ``start_index`` to ``end_index`` (the end of the file by default).
+
+        Rows are streamed from the upload and rendered, chunked and sent or
+        queued as they are read, so memory stays bounded by the batch size.
+        Returns a summary of the batching used.
+        """
+        # Ensure any inline edits in the one2many are persisted before reading.
+        self.env.flush_all()
+        mapping = self._get_mapping(self._get_csv_header_row())
+        source_record = self._get_source_record()
+        base_values = self.template_id._values_from_record(source_record) if source_record else {}
+        rows = self._iter_csv_rows(start_index, end_index)
+        first_row = next(rows, None)
+        if first_row is None:
+            raise UserError(_("Start row is beyond the end of the CSV file."))
+
+        service = self.env["natura.print.service"]
+        label_values = self._iter_label_values(chain([first_row], rows), mapping, base_values)
+        count = None
+        if self.pool_id:
+            # Splitting across a pool needs the label count; count it in a separate pass.
+            rows_per_label, _group_map = self._get_rows_per_label()
+            row_count = self._count_csv_rows(start_index, end_index)
+            count = -(-row_count // rows_per_label)
+        name = _("CSV labels: %s") % (self.csv_filename or self.template_id.display_name)
+        # Print All and Print Remainder send a row range once per wizard, even
+        # when double-clicked; Test Print may be repeated on purpose.
+        scope = None if direct else f"{self._name},{self.id},{start_index}-{end_index or ''}"
+        batch_ref = None if direct else service._new_batch_ref()
+        summaries = []
+        for printer_ip, values_list in service._distribute(
+            label_values, self.printer_id.ip_address, self.pool_id, count=count
+        ).items():
+            render = service._get_label_renderer(self.template_id, printer_ip, batch_ref=batch_ref)
+            labels = (render(values) for values in values_list)
+            chunker = service._get_adaptive_chunker(printer_ip)
+            if direct:
+                service.print_zpl_many(labels, printer_ip, chunker=chunker)
+            else:
+                service.submit_zpl_many(
+                    labels,
+                    printer_ip,
+                    name=name,
+                    chunker=chunker,
+                    idempotency_scope=scope,
+                    batch_ref=batch_ref,
+                )
+            summaries.append(chunker.summary())
+        self.last_run_summary = self._format_run_summary(summaries)
+        return self.last_run_summary
+
+    @api.model
+    def _format_run_summary(self, summaries):
+        """Describe the batching of one run; ``summaries`` has one entry per printer."""
+        labels = sum(summary["labels"] for summary in summaries)
+        requests = sum(summary["requests"] for summary in summaries)
+        latencies = [
+            summary["avg_latency"] for summary in summaries if summary["avg_latency"] is not None
+        ]
+        message = _(
+            "%(labels)s labels in %(requests)s requests "
+            "(%(per_request).1f labels/request, final batch target %(target).0f KB)",
+            labels=labels,
+            requests=requests,
+            per_request=labels / requests if requests else 0.0,
+            target=max((summary["target_kb"] for summary in summaries), default=0.0),
+        )
+        if len(summaries) > 1:
+            message += _(", split across %s printers", len(summaries))
+        if latencies:
+            message += _(", average send %.2fs", sum(latencies) / len(latencies))
+        return message
+
+    def _notify_and_close(self, message):
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("CSV labels sent"),
+                "message": message,
+                "type": "success",
+                "next": {"type": "ir.actions.act_window_close"},
+            },
+        }
+
+    def action_update_preview(self):
+        self.ensure_one()
+        self._update_preview_image(silent=False)
+        return self._return_wizard_action()
+
+    def action_preview_rows(self):
+        """Render the labels Test Print would send as one image, without printing."""
+        self.ensure_one()
+        self.env.flush_all()
+        start_index = max((self.start_row or 2) - 1, 0)
+        source_record = self._get_source_record()
+        template = self.template_id
+        base_values = template._values_from_record(source_record) if source_record else {}
+        rows_per_label, _group_map = self._get_rows_per_label()
+        test_rows = int(self.env.user.natura_print_csv_test_rows or CSV_BATCH_SIZE)
+        end_index = start_index + self._aligned_count(test_rows, rows_per_label)
+        label_values = islice(
+            self._iter_label_values(
+                self._iter_csv_rows(start_index, end_index),
+                self._get_mapping(self._get_csv_header_row()),
+                base_values,
+            ),
+            ROW_PREVIEW_MAX_LABELS,
+        )
+        results = self.env["natura.print.service"]._render_previews(
+            [
+                (template._render_zpl_from_values(values), template.dpi, template.width, template.height)
+                for values in label_values
+            ]
+        )
+        if not results:
+            raise UserError(_("Start row is beyond the end of the CSV file."))
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        self.rows_preview_image = base64.b64encode(_stitch_previews(results))
+        return self._return_wizard_action()
 
     def action_print_csv(self):
         self.ensure_one()
-        rows = self._get_csv_data()
         start_index = max((self.start_row or 2) - 1, 0)
-        self._print_csv_range(rows, start_index, len(rows))
-        return {"type": "ir.actions.act_window_close"}
+        return self._notify_and_close(self._print_csv_range(start_index))
 
     def action_test_print_csv(self):
         self.ensure_one()
-        rows = self._get_csv_data()
         start_index = max((self.start_row or 2) - 1, 0)
-        rows_per_label, _ = self._get_rows_per_label()
+        rows_per_label, _group_map = self._get_rows_per_label()
         test_rows = int(self.env.user.natura_print_csv_test_rows or CSV_BATCH_SIZE)
         test_rows_aligned = self._aligned_count(test_rows, rows_per_label)
-        end_index = min(len(rows), start_index + test_rows_aligned)
-        self._print_csv_range(rows, start_index, end_index)
+        self._print_csv_range(start_index, start_index + test_rows_aligned, direct=True)
         self.test_print_done = True
         return self._return_wizard_action()
 
@@ -511,16 +703,52 @@ class NaturaPrintCsvLabelWizard(models.TransientModel):
         self.ensure_one()
         if not self.test_print_done:
             raise UserError(_("Please run Test Print before printing the remainder."))
-        rows = self._get_csv_data()
         start_index = max((self.start_row or 2) - 1, 0)
-        rows_per_label, _ = self._get_rows_per_label()
+        rows_per_label, _group_map = self._get_rows_per_label()
         test_rows = int(self.env.user.natura_print_csv_test_rows or CSV_BATCH_SIZE)
         test_rows_aligned = self._aligned_count(test_rows, rows_per_label)
         remainder_start = start_index + test_rows_aligned
-        if remainder_start >= len(rows):
+        if next(self._iter_csv_rows(remainder_start, remainder_start + 1), None) is None:
             raise UserError(_("There are no remaining rows to print."))
-        self._print_csv_range(rows, remainder_start, len(rows))
-        return {"type": "ir.actions.act_window_close"}
+        return self._notify_and_close(self._print_csv_range(remainder_start))
+
+
+class _Base64Reader(io.RawIOBase):
+    """Readable stream of base64 ``data``, decoded ``CSV_DECODE_CHUNK`` characters at a time."""
+
+    def __init__(self, data):
+        super().__init__()
+        self._data = data.encode() if isinstance(data, str) else data
+        self._position = 0
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending and self._position < len(self._data):
+            chunk = self._data[self._position:self._position + CSV_DECODE_CHUNK]
+            self._position += len(chunk)
+            self._pending = base64.b64decode(chunk)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _stitch_previews(pngs):
+    """Return one PNG with the label images of ``pngs`` side by side."""
+    images = [Image.open(io.BytesIO(png)).convert("L") for png in pngs]
+    width = sum(image.width for image in images) + ROW_PREVIEW_GAP * (len(images) - 1)
+    # Grey gaps keep the white labels apart.
+    strip = Image.new("L", (max(width, 1), max(image.height for image in images)), 200)
+    left = 0
+    for image in images:
+        strip.paste(image, (left, 0))
+        left += image.width + ROW_PREVIEW_GAP
+    buffer = io.BytesIO()
+    strip.save(buffer, format="PNG")
+    return buffer.getvalue()
 
 
 class NaturaPrintCsvMappingLine(models.TransientModel):
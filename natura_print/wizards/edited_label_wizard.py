@@ -1,9 +1,6 @@
-import base64
 import json
-import requests
 
-from odoo import api, fields, models, _
-from odoo.exceptions import UserError
+from odoo import api, fields, models
 
 
 class NaturaPrintEditedLabelWizard(models.TransientModel):
@@ -28,8 +25,17 @@ class NaturaPrintEditedLabelWizard(models.TransientModel):
         "wizard_id",
         string="Placeholders",
     )
-    preview_image = fields.Binary(string="Preview", attachment=False)
+    # Id of the shared preview cache attachment, see natura.print.service.
+    preview_attachment_id = fields.Integer(string="Preview Attachment")
+    preview_image = fields.Binary(string="Preview", compute="_compute_preview_image")
     preview_error = fields.Char(string="Preview Error", readonly=True)
+    preview_backend = fields.Selection(related="template_id.preview_backend")
+
+    @api.depends("preview_attachment_id")
+    def _compute_preview_image(self):
+        for wizard in self:
+            attachment = self.env["ir.attachment"].sudo().browse(wizard.preview_attachment_id)
+            wizard.preview_image = attachment.exists().datas if attachment else False
 
     @api.model
     def default_get(self, fields_list):
@@ -59,7 +65,7 @@ class NaturaPrintEditedLabelWizard(models.TransientModel):
     def _onchange_template_id(self):
         if not self.template_id:
             self.line_ids = [(5, 0, 0)]
-            self.preview_image = False
+            self.preview_attachment_id = 0
             self.preview_error = False
             return
         source = self._get_source_record(
@@ -74,7 +80,8 @@ class NaturaPrintEditedLabelWizard(models.TransientModel):
             (0, 0, {"placeholder": placeholder, "value": values.get(placeholder, "")})
             for placeholder in placeholders
         ]
-        self._update_preview_image(silent=True)
+        # Only show an already rendered preview; Update Preview renders one.
+        self._update_preview_image(silent=True, cached_only=True)
 
     @api.onchange("line_ids")
     def _onchange_line_ids(self):
@@ -118,34 +125,9 @@ class NaturaPrintEditedLabelWizard(models.TransientModel):
         return values
 
     def _send_labels(self, zpl):
-        params = self.env["ir.config_parameter"].sudo()
-        hostname = params.get_param("natura_print.hostname")
-        api_user = params.get_param("natura_print.api_user")
-        api_password = params.get_param("natura_print.api_password")
-
-        if not hostname or not api_user or not api_password:
-            raise UserError(
-                _(
-                    "Missing configuration. Set Hostname, API User, and API Password "
-                    "under Settings > Configuration."
-                )
-            )
-
-        payload = {
-            "zpl": zpl,
-            "printer_ip": self.printer_id.ip_address,
-            "qty": self.qty or 1,
-        }
-        try:
-            response = requests.post(
-                hostname,
-                json=payload,
-                auth=(api_user, api_password),
-                timeout=10,
-            )
-            response.raise_for_status()
-        except requests.RequestException as exc:
-            raise UserError(_("Print failed: %s") % exc) from exc
+        self.env["natura.print.service"].print_zpl(
+            zpl, self.printer_id.ip_address, qty=self.qty or 1
+        )
 
     def action_update_preview(self):
         self.ensure_one()
@@ -161,49 +143,34 @@ class NaturaPrintEditedLabelWizard(models.TransientModel):
             "context": dict(self.env.context),
         }
 
-    def _update_preview_image(self, silent=False):
+    def _update_preview_image(self, silent=False, cached_only=False):
         self.ensure_one()
         self._ensure_source_context()
         self.preview_error = False
         if not self.template_id:
-            self.preview_image = False
-            return
-        dpmm = self.template_id._labelary_dpmm()
-        if not dpmm:
-            self.preview_image = False
-            self.preview_error = "Unsupported DPI for Labelary preview."
-            if not silent:
-                raise UserError(self.preview_error)
+            self.preview_attachment_id = 0
             return
         if not self.template_id.width or not self.template_id.height:
-            self.preview_image = False
+            self.preview_attachment_id = 0
             return
         zpl = self.template_id._render_zpl_from_values(self._build_values())
-        url = (
-            f"https://api.labelary.com/v1/printers/{dpmm}dpmm/"
-            f"labels/{self.template_id.width}x{self.template_id.height}/0/"
-        )
-        try:
-            response = requests.post(
-                url,
-                data=zpl.encode("utf-8"),
-                headers={"Accept": "image/png"},
-                timeout=10,
-            )
-            response.raise_for_status()
-            self.preview_image = base64.b64encode(response.content)
-        except requests.RequestException as exc:
-            self.preview_image = False
-            self.preview_error = f"Preview failed: {exc}"
+        preview = self.template_id._get_preview_attachment(zpl, cached_only=cached_only)
+        if isinstance(preview, Exception):
+            self.preview_attachment_id = 0
+            self.preview_error = str(preview)
             if not silent:
-                raise UserError(self.preview_error)
+                raise preview
+            return
+        self.preview_attachment_id = preview.id if preview else 0
 
     def action_print(self):
         self.ensure_one()
         self.env.flush_all()
         self._ensure_source_context()
-        zpl = self.template_id._render_zpl_from_values(self._build_values())
-        self._send_labels(zpl)
+        render = self.env["natura.print.service"]._get_label_renderer(
+            self.template_id, self.printer_id.ip_address
+        )
+        self._send_labels(render(self._build_values()))
         return {"type": "ir.actions.act_window_close"}
 
 
@@ -1,5 +1,3 @@
-import requests
-
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
 
@@ -17,7 +15,11 @@ class NaturaPrintMrpLabelWizard(models.TransientModel):
     printer_id = fields.Many2one(
         "printers.list",
         string="Printer",
-        required=True,
+    )
+    pool_id = fields.Many2one(
+        "natura.print.printer.pool",
+        string="Printer Pool",
+        help="Split the labels across the available printers of this pool instead.",
     )
     line_ids = fields.One2many(
         "natura.print.mrp.label.line",
@@ -57,38 +59,12 @@ class NaturaPrintMrpLabelWizard(models.TransientModel):
 
     def action_send_labels(self):
         self.ensure_one()
-        params = self.env["ir.config_parameter"].sudo()
-        hostname = params.get_param("natura_print.hostname")
-        api_user = params.get_param("natura_print.api_user")
-        api_password = params.get_param("natura_print.api_password")
-
-        if not hostname or not api_user or not api_password:
-            raise UserError(
-                _(
-                    "Missing configuration. Set Hostname, API User, and API Password "
-                    "under Settings > Configuration."
-                )
-            )
-
-        for line in self.line_ids:
-            if not line.production_id:
-                continue
-            zpl = self.template_id._render_zpl(line.production_id)
-            payload = {
-                "zpl": zpl,
-                "printer_ip": self.printer_id.ip_address,
-                "qty": line.qty or 1,
-            }
-            try:
-                response = requests.post(
-                    hostname,
-                    json=payload,
-                    auth=(api_user, api_password),
-                    timeout=10,
-                )
-                response.raise_for_status()
-            except requests.RequestException as exc:
-                raise UserError(_("Print failed: %s") % exc) from exc
+        self.env["natura.print.service"].submit_record_labels(
+            self,
+            self.line_ids,
+            "production_id",
+            name=_("Manufacturing order labels: %s") % self.template_id.display_name,
+        )
 
         return {"type": "ir.actions.act_window_close"}
 
@@ -101,6 +77,7 @@ class NaturaPrintMrpLabelWizard(models.TransientModel):
         action["context"] = {
             "default_template_id": self.template_id.id,
             "default_printer_id": self.printer_id.id,
+            "default_pool_id": self.pool_id.id,
             "default_source_model": record._name,
             "default_source_res_id": record.id,
         }
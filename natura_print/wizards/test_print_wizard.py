@@ -1,7 +1,4 @@
-import requests
-
 from odoo import fields, models, _
-from odoo.exceptions import UserError
 
 
 class NaturaPrintTestWizard(models.TransientModel):
@@ -22,34 +19,11 @@ class NaturaPrintTestWizard(models.TransientModel):
 
     def action_send_test(self):
         self.ensure_one()
-        params = self.env["ir.config_parameter"].sudo()
-        hostname = params.get_param("natura_print.hostname")
-        api_user = params.get_param("natura_print.api_user")
-        api_password = params.get_param("natura_print.api_password")
-
-        if not hostname or not api_user or not api_password:
-            raise UserError(
-                _(
-                    "Missing configuration. Set Hostname, API User, and API Password "
-                    "under Settings > Configuration."
-                )
-            )
-
-        payload = {
-            "zpl": self.template_id.zpl_code or "",
-            "printer_ip": self.printer_id.ip_address,
-            "qty": self.qty or 1,
-        }
-
-        try:
-            response = requests.post(
-                hostname,
-                json=payload,
-                auth=(api_user, api_password),
-                timeout=10,
-            )
-            response.raise_for_status()
-        except requests.RequestException as exc:
-            raise UserError(_("Test print failed: %s") % exc) from exc
+        self.env["natura.print.service"].print_zpl(
+            self.template_id.zpl_code or "",
+            self.printer_id.ip_address,
+            qty=self.qty or 1,
+            error_label=_("Test print failed"),
+        )
 
         return {"type": "ir.actions.act_window_close"}